@@ -1,40 +1,554 @@
 import streamlit as st
 import pandas as pd
-from auth import register_user, login_user, create_admin_if_not_exists
+from auth import register_user, login_user, get_user_names, update_user
+from sessions import create_session, validate_session, rotate_session, revoke_session, session_id
 from documents import (
-    ensure_default_categories, list_categories, add_category, remove_category,
-    upload_document, list_documents, update_metadata, replace_file, delete_document
+    list_categories, add_category, remove_category,
+    upload_document, update_metadata, replace_file, delete_document, get_document,
+    get_dashboard_stats, get_dedup_stats, list_documents_page, count_documents, bulk_upload_documents,
+    bulk_delete_documents, bulk_update_metadata, export_documents_zip
 )
-from db import users_col
-from utils import file_to_base64
+from db import users_col, query_counter
+from storage import file_exists, UploadRejected
+from search import search_documents
+from bootstrap import run_bootstrap
+import thumbnails
+from thumbnails import get_thumbnail
+from utils import file_to_base64, read_file_bytes, inline_allowed, get_secret
 from datetime import datetime
-import os, base64
+from collections import deque, OrderedDict
+import os, base64, time, logging, functools, threading
+import file_server
+import metrics
+import reports
+import jobs
+
+_rerun_started = time.perf_counter()
+query_counter.reset()
 
 st.set_page_config(page_title="Aplikasi Arsip KPU Kota Surabaya", layout="wide")
 
+PAGE_SIZE = 20
+
 # ---------------------------
 # Setup awal
 # ---------------------------
-ensure_default_categories()
-create_admin_if_not_exists()
+@st.cache_resource
+def _bootstrap():
+    info = run_bootstrap()
+    if file_server.enabled() and file_server.EMBEDDED:
+        file_server.start_file_server()
+    return info
+
+BOOT = _bootstrap()
 
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
     st.session_state.user = None
+    st.session_state.session_token = None
 if "auth_page" not in st.session_state:
     st.session_state.auth_page = "login"
+if "rerun_ms" not in st.session_state:
+    st.session_state.rerun_ms = deque(maxlen=50)
+if "fragment_ms" not in st.session_state:
+    st.session_state.fragment_ms = deque(maxlen=50)
+# False selama rerun yang hanya menjalankan satu fragment
+st.session_state.full_run = True
 
 # ---------------------------
 # Helper: Preview PDF
 # ---------------------------
-def preview_pdf_inline(file_path, height=600):
-    if not os.path.exists(file_path):
+def file_session_id():
+    """Id sesi login untuk URL file server (URL ikut tidak berlaku saat sesi dicabut)."""
+    return session_id(st.session_state.get("session_token"))
+
+def too_large_notice():
+    st.caption("File terlalu besar untuk dibuka tanpa file server. "
+               "Hubungi admin untuk mengaktifkan FILE_SERVER_URL.")
+
+def preview_pdf_inline(file_path, height=600, size=None):
+    if not file_exists(file_path):
         st.error("File tidak ditemukan di server.")
         return
-    b64 = file_to_base64(file_path)
-    href = f'<iframe src="data:application/pdf;base64,{b64}" width="100%" height="{height}"></iframe>'
+    if file_server.enabled():
+        src = file_server.signed_url(file_path, file_session_id())
+    elif not inline_allowed(file_path, size):
+        too_large_notice()
+        return
+    else:
+        src = f"data:application/pdf;base64,{file_to_base64(file_path)}"
+    href = f'<iframe src="{src}" width="100%" height="{height}"></iframe>'
     st.markdown(href, unsafe_allow_html=True)
 
+# ---------------------------
+# Helper: Download & preview lazy
+# File baru dibaca setelah user menekan tombol, bukan di setiap rerun.
+# ---------------------------
+def lazy_download(d, key, exists=None):
+    path = d.get("file_path", "")
+    if not (file_exists(path) if exists is None else exists):
+        return
+    if file_server.enabled():
+        url = file_server.signed_url(path, file_session_id(),
+                                     download_name=d.get("original_filename", "dokumen.pdf"))
+        st.link_button("Download", url)
+        return
+    # size_bytes ikut LIST_FIELDS; dokumen lama tanpa field itu baru dicek
+    # ukurannya setelah tombol ditekan agar rerun tidak membaca storage per baris
+    size = d.get("size_bytes")
+    flag = f"prep_dl_{key}"
+    if (size is not None or st.session_state.get(flag)) and not inline_allowed(path, size):
+        too_large_notice()
+        return
+    if st.session_state.get(flag):
+        st.download_button("Download", read_file_bytes(path),
+                           file_name=d.get("original_filename", "dokumen.pdf"),
+                           key=f"dl_{key}",
+                           on_click=lambda: st.session_state.pop(flag, None))
+    elif st.button("Siapkan Download", key=f"prep_btn_{key}"):
+        st.session_state[flag] = True
+        rerun_here()
+
+def lazy_preview(d, key, height=600, exists=None):
+    path = d.get("file_path", "")
+    if not (file_exists(path) if exists is None else exists):
+        st.error("File tidak tersedia di server.")
+        return
+    flag = f"prep_pv_{key}"
+    low_res = get_thumbnail(path, "preview")
+    if low_res and not st.session_state.get(flag):
+        st.image(low_res, caption="Halaman pertama", use_container_width=True)
+    if st.session_state.get(flag):
+        preview_pdf_inline(path, height=height, size=d.get("size_bytes"))
+        if st.button("Tutup Preview", key=f"pv_close_{key}"):
+            st.session_state[flag] = False
+            rerun_here()
+    elif st.button("Tampilkan PDF lengkap" if low_res else "Tampilkan Preview", key=f"pv_btn_{key}"):
+        st.session_state[flag] = True
+        rerun_here()
+
+# ---------------------------
+# Helper: Fragment
+# Klik di dalam fragment hanya menjalankan ulang fragment itu, bukan seluruh
+# halaman. Durasi rerun fragment dicatat terpisah dari rerun penuh.
+# ---------------------------
+def timed_fragment(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            started, queries = time.perf_counter(), query_counter.count()
+            st.session_state.in_fragment = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                st.session_state.in_fragment = False
+                if not st.session_state.full_run:
+                    ms = (time.perf_counter() - started) * 1000
+                    st.session_state.fragment_ms.append((name, ms, query_counter.count() - queries))
+                    metrics.observe(f"fragment.{name}", ms)
+        return st.fragment(run)
+    return decorate
+
+def rerun_here():
+    """Rerun fragment yang sedang berjalan, atau seluruh halaman di luar fragment."""
+    st.rerun(scope="fragment" if st.session_state.get("in_fragment") else "app")
+
+# ---------------------------
+# Helper: Baris dokumen
+# Info file per baris (ada/tidak, thumbnail) di-cache per (id, uploaded_at);
+# uploaded_at berubah saat file diganti sehingga entri lama tidak terpakai.
+# LRU dibatasi ROW_CACHE_SIZE entri agar entri lama tidak menumpuk di memori.
+# ---------------------------
+ROW_CACHE_TTL = int(os.getenv("ROW_CACHE_TTL", "600"))
+ROW_CACHE_SIZE = int(os.getenv("ROW_CACHE_SIZE", "5000"))
+
+@st.cache_resource
+def _row_cache():
+    return OrderedDict(), threading.Lock()   # key -> (info, checked_at)
+
+def _row_cache_get(key):
+    lru, lock = _row_cache()
+    with lock:
+        hit = lru.get(key)
+        if hit is None or time.monotonic() - hit[1] >= ROW_CACHE_TTL:
+            return None
+        lru.move_to_end(key)
+        return hit[0]
+
+def _row_cache_set(key, info):
+    lru, lock = _row_cache()
+    with lock:
+        lru[key] = (info, time.monotonic())
+        lru.move_to_end(key)
+        while len(lru) > ROW_CACHE_SIZE:
+            lru.popitem(last=False)
+
+def row_file_info(d):
+    key = (str(d["_id"]), d.get("uploaded_at"))
+    info = _row_cache_get(key)
+    if info is None or (info["thumb"] and not os.path.exists(info["thumb"])):
+        path = d.get("file_path", "")
+        info = {"exists": file_exists(path), "thumb": get_thumbnail(path)}
+        # thumbnail yang masih dirender dicoba lagi di rerun berikutnya;
+        # render yang gagal di-cache seperti hasil final
+        if (info["thumb"] or not info["exists"] or not thumbnails.enabled()
+                or thumbnails.failed(path)):
+            _row_cache_set(key, info)
+    return info
+
+def row_document(d):
+    """Dokumen terbaru untuk baris: versi hasil edit di fragment jika ada."""
+    doc_id = str(d["_id"])
+    return st.session_state.get(f"rowdoc_{doc_id}", d)
+
+def reset_rows(docs):
+    # rerun penuh membaca ulang daftar dari DB; buang state lama per baris
+    for d in docs:
+        st.session_state.pop(f"rowdoc_{d['_id']}", None)
+        st.session_state.pop(f"deleted_{d['_id']}", None)
+
+def edit_metadata_form(d):
+    doc_id = str(d["_id"])
+    st.subheader("Edit Metadata")
+    # st.form: mengetik tidak memicu rerun, hanya Simpan/Batal
+    with st.form(f"edit_form_{doc_id}"):
+        new_title = st.text_input("Judul", value=d.get("title",""), key=f"title_{doc_id}")
+        new_desc = st.text_area("Deskripsi", value=d.get("description",""), key=f"desc_{doc_id}")
+        cats = list_categories()
+        new_cat = st.selectbox("Kategori", cats, index=cats.index(d.get("category")) if d.get("category") in cats else 0, key=f"cat_{doc_id}")
+        new_year = st.number_input("Tahun", min_value=1900, max_value=2100, value=int(d.get("year", datetime.utcnow().year)), key=f"year_{doc_id}")
+        c1, c2 = st.columns(2)
+        save = c1.form_submit_button("Simpan")
+        cancel = c2.form_submit_button("Batal")
+    if save:
+        ok = update_metadata(doc_id, {
+            "title": new_title.strip(),
+            "description": new_desc.strip(),
+            "category": new_cat,
+            "year": int(new_year)
+        })
+        if ok:
+            st.session_state[f"rowdoc_{doc_id}"] = get_document(doc_id)
+            st.session_state[f"editing_{doc_id}"] = False
+            st.toast("Metadata diperbarui.")
+            st.rerun(scope="fragment")
+    if cancel:
+        st.session_state[f"editing_{doc_id}"] = False
+        st.rerun(scope="fragment")
+
+def delete_row(doc_id):
+    if delete_document(doc_id):
+        st.session_state[f"deleted_{doc_id}"] = True
+        st.rerun(scope="fragment")
+
+@timed_fragment("document_row")
+def document_row(d, scope, can_edit, can_delete, uploader_name=None):
+    d = row_document(d)
+    doc_id = str(d["_id"])
+    if st.session_state.get(f"deleted_{doc_id}"):
+        st.success(f"Dokumen \"{d.get('title')}\" dihapus.")
+        return
+    info = row_file_info(d)
+    if scope == "arsip":
+        thumb_col, *cols = st.columns([1,4,1,1,1])
+        with thumb_col:
+            if info["thumb"]:
+                st.image(info["thumb"], width=100)
+        with cols[0]:
+            st.markdown(
+                f"**{d.get('title')}**  \n"
+                f"Kategori: {d.get('category')}  • Tahun: {d.get('year')}  \n"
+                f"Uploader: {uploader_name}  \n"
+                f"Uploaded: {d.get('uploaded_at')}"
+            )
+            st.write(d.get("description", ""))
+        with cols[1]:
+            lazy_download(d, f"{scope}_{doc_id}", exists=info["exists"])
+        edit_col, delete_col = cols[2], cols[3]
+        with st.expander("Preview Dokumen"):
+            lazy_preview(d, f"{scope}_{doc_id}", height=600, exists=info["exists"])
+    else:
+        st.markdown(f"### {d.get('title')}")
+        st.write(f"Kategori: {d.get('category')}  • Tahun: {d.get('year')}")
+        st.write(f"Deskripsi: {d.get('description', '')}")
+        st.write(f"Uploaded: {d.get('uploaded_at')}")
+        col1, col2, edit_col, delete_col = st.columns([1,1,1,1])
+        with col1:
+            lazy_download(d, f"{scope}_{doc_id}", exists=info["exists"])
+        with col2:
+            with st.expander("Preview Dokumen"):
+                lazy_preview(d, f"{scope}_{doc_id}", height=400, exists=info["exists"])
+    with edit_col:
+        if can_edit and st.button("Edit Metadata" if scope == "own" else "Edit", key=f"edit_{doc_id}"):
+            st.session_state[f"editing_{doc_id}"] = True
+            st.rerun(scope="fragment")
+    with delete_col:
+        if can_delete and st.button("Hapus", key=f"hapus_{scope}_{doc_id}"):
+            delete_row(doc_id)
+    if st.session_state.get(f"editing_{doc_id}", False):
+        edit_metadata_form(d)
+
+# ---------------------------
+# Helper: Sesi login (token di query param `sid`, divalidasi setiap rerun)
+# ---------------------------
+def start_session(user):
+    token = create_session(user, client_ip())
+    st.session_state.logged_in = True
+    st.session_state.user = user
+    st.session_state.session_token = token
+    st.query_params["sid"] = token
+
+def end_session():
+    revoke_session(st.session_state.get("session_token"))
+    st.session_state.logged_in = False
+    st.session_state.user = None
+    st.session_state.session_token = None
+    if "sid" in st.query_params:
+        del st.query_params["sid"]
+
+def restore_session():
+    token = st.session_state.get("session_token")
+    if token:
+        principal = validate_session(token, client_ip())
+    elif st.query_params.get("sid"):
+        # token dari URL (reload/tab baru/link disalin): tukar dengan token baru
+        # agar URL lama tidak bisa dipakai lagi
+        token, principal = rotate_session(st.query_params.get("sid"), client_ip())
+        if token:
+            st.query_params["sid"] = token
+    else:
+        return
+    if principal:
+        st.session_state.logged_in = True
+        st.session_state.user = principal
+        st.session_state.session_token = token
+    else:
+        end_session()
+
+# ---------------------------
+# Helper: IP klien (untuk rate limit login)
+# ---------------------------
+# Jumlah reverse proxy tepercaya di depan app. 0 = X-Forwarded-For diabaikan
+# (bisa diisi bebas oleh client) dan alamat peer koneksi yang dipakai.
+TRUSTED_PROXY_HOPS = int(get_secret("TRUSTED_PROXY_HOPS", 0))
+
+@st.cache_resource
+def _warn_no_client_ip():
+    # sekali per proses: tanpa IP, batas login per IP dan ikatan sesi ke IP tidak berlaku
+    logging.getLogger("app").warning(
+        "IP client tidak tersedia (st.context.ip_address butuh streamlit>=1.45); "
+        "rate limit login per IP dan ikatan sesi ke IP nonaktif")
+
+def client_ip():
+    peer = getattr(st.context, "ip_address", None)
+    if TRUSTED_PROXY_HOPS <= 0:
+        if peer is None:
+            _warn_no_client_ip()
+        return peer
+    try:
+        forwarded = [p.strip() for p in st.context.headers.get("X-Forwarded-For", "").split(",") if p.strip()]
+    except AttributeError:
+        return peer
+    # entri paling kanan ditambahkan proxy kita; yang lebih kiri dikendalikan client
+    if len(forwarded) >= TRUSTED_PROXY_HOPS:
+        return forwarded[-TRUSTED_PROXY_HOPS]
+    return forwarded[0] if forwarded else peer
+
+# ---------------------------
+# Helper: Pilihan multi-dokumen & aksi massal
+# ---------------------------
+def selected_ids(scope):
+    return st.session_state.setdefault(f"selected_{scope}", set())
+
+def select_checkbox(scope, doc_id):
+    sel = selected_ids(scope)
+    key = f"sel_{scope}_{doc_id}"
+    st.session_state.setdefault(key, doc_id in sel)
+    def toggle():
+        if st.session_state[key]:
+            sel.add(doc_id)
+        else:
+            sel.discard(doc_id)
+    st.checkbox("Pilih", key=key, on_change=toggle)
+
+def _set_selection(scope, doc_ids, value):
+    sel = selected_ids(scope)
+    for doc_id in doc_ids:
+        st.session_state[f"sel_{scope}_{doc_id}"] = value
+        (sel.add if value else sel.discard)(doc_id)
+
+def batch_actions(scope, docs, can_delete, can_edit, owner_id=None):
+    sel = selected_ids(scope)
+    with st.expander(f"Aksi massal ({len(sel)} dokumen dipilih)", expanded=bool(sel)):
+        c1, c2 = st.columns(2)
+        if c1.button("Pilih semua di halaman ini", key=f"selall_{scope}"):
+            _set_selection(scope, [str(d["_id"]) for d in docs], True)
+            st.rerun()
+        if c2.button("Kosongkan pilihan", key=f"selnone_{scope}"):
+            _set_selection(scope, list(sel), False)
+            st.rerun()
+        if not sel:
+            st.caption("Centang 'Pilih' pada dokumen untuk memakai aksi massal.")
+            return
+        ids = list(sel)
+        if can_edit:
+            cats = list_categories()
+            c1, c2 = st.columns([3,1])
+            new_cat = c1.selectbox("Pindahkan ke kategori", cats, key=f"bulkcat_{scope}")
+            if c2.button("Pindahkan", key=f"bulkcat_btn_{scope}"):
+                n = bulk_update_metadata(ids, {"category": new_cat}, owner_id=owner_id)
+                st.success(f"{n} dokumen dipindahkan ke {new_cat}.")
+                st.rerun()
+        if can_delete:
+            confirm = st.checkbox(f"Ya, hapus {len(ids)} dokumen terpilih", key=f"bulkdel_ok_{scope}")
+            if st.button("Hapus terpilih", key=f"bulkdel_{scope}", disabled=not confirm):
+                n = bulk_delete_documents(ids, owner_id=owner_id)
+                _set_selection(scope, ids, False)
+                st.success(f"{n} dokumen dihapus.")
+                st.rerun()
+        if st.button("Export ZIP terpilih", key=f"export_btn_{scope}"):
+            with st.spinner("Menyiapkan ZIP..."):
+                st.session_state[f"export_{scope}"] = export_documents_zip(ids, owner_id=owner_id)
+        zip_path = st.session_state.get(f"export_{scope}")
+        if zip_path and os.path.exists(zip_path):
+            offer_export_file(zip_path, f"export_dl_{scope}", "application/zip")
+
+# ---------------------------
+# Helper: Kelola kategori (fragment)
+# ---------------------------
+@timed_fragment("categories")
+def category_manager():
+    st.subheader("Tambah Kategori")
+    new_cat = st.text_input("Nama kategori baru")
+    if st.button("Tambah"):
+        if not new_cat.strip():
+            st.error("Nama kategori tidak boleh kosong.")
+        elif add_category(new_cat.strip()):
+            st.success("Kategori ditambahkan")
+        else:
+            st.error("Kategori sudah ada")
+    st.subheader("Daftar Kategori")
+    cats = list_categories()
+    for c in cats:
+        col1, col2 = st.columns([4,1])
+        col1.write(c)
+        if col2.button("Hapus", key=f"delcat_{c}"):
+            remove_category(c)
+            st.toast(f"Kategori {c} dihapus")
+            st.rerun(scope="fragment")
+
+# ---------------------------
+# Helper: Ekspor inventaris (job latar belakang)
+# ---------------------------
+def offer_export_file(path, key, mime):
+    """
+    Link file server untuk file ekspor, atau tombol download satu kali: isi
+    file baru dibaca ke memori setelah user menekan "Siapkan", bukan di setiap rerun.
+    """
+    name = os.path.basename(path)
+    if file_server.enabled():
+        st.link_button(f"Download {name}", file_server.signed_url(
+            path, file_session_id(), download_name=name))
+        return
+    flag = f"prep_{key}"
+    if st.session_state.get(flag) == path:
+        with open(path, "rb") as f:
+            st.download_button(f"Download {name}", f, file_name=name, mime=mime, key=key,
+                               on_click=lambda: st.session_state.pop(flag, None))
+    elif st.button(f"Siapkan download {name}", key=f"{flag}_btn"):
+        st.session_state[flag] = path
+        rerun_here()
+
+@st.fragment(run_every=2)
+def inventory_job_progress():
+    # hanya dipasang selama job berjalan; selesai/gagal -> rerun penuh, polling berhenti
+    job = reports.export_status(st.session_state.get("inventory_job"))
+    if not job or job["state"] not in ("queued", "running"):
+        st.rerun()
+    if job["total"] is None:
+        st.progress(0.0, text="Menyiapkan ekspor...")
+        return
+    total = max(job["total"], 1)
+    st.progress(min(job["done"] / total, 1.0),
+                text=f"Mengekspor {job['done']:,}/{job['total']:,} baris...")
+
+def inventory_job_status():
+    job = reports.export_status(st.session_state.get("inventory_job"))
+    if not job:
+        return
+    if job["state"] in ("queued", "running"):
+        inventory_job_progress()
+    elif job["state"] == "failed":
+        st.error(f"Ekspor gagal: {job['error']}")
+    elif job["path"] and os.path.exists(job["path"]):
+        st.success(f"Ekspor selesai: {job['done']:,} baris.")
+        mime = "text/csv" if job["format"] == "csv" else \
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        offer_export_file(job["path"], "inventory_dl", mime)
+
+def inventory_export():
+    with st.expander("📤 Ekspor inventaris (CSV/XLSX)"):
+        c1, c2, c3 = st.columns(3)
+        fmt = c1.selectbox("Format", reports.formats(), key="inv_fmt")
+        cat = c2.selectbox("Kategori", ["Semua"] + list_categories(), key="inv_cat")
+        year = c3.number_input("Tahun (0 = semua)", min_value=0, max_value=2100, value=0, key="inv_year")
+        if st.button("Mulai ekspor", key="inv_start"):
+            filters = {}
+            if cat != "Semua":
+                filters["category"] = cat
+            if year:
+                filters["year"] = int(year)
+            st.session_state.inventory_job = reports.start_export(
+                filters, fmt, owner_id=st.session_state.user["_id"])
+        inventory_job_status()
+
+# ---------------------------
+# Helper: Pager (keyset cursor disimpan per halaman di session_state)
+# ---------------------------
+def pager_cursor(key, reset_on=None):
+    stack_key = f"pager_{key}"
+    sig_key = f"pager_sig_{key}"
+    if stack_key not in st.session_state or st.session_state.get(sig_key) != reset_on:
+        st.session_state[stack_key] = [None]
+        st.session_state[sig_key] = reset_on
+    return st.session_state[stack_key][-1]
+
+def pager_controls(key, next_cursor):
+    stack = st.session_state[f"pager_{key}"]
+    col1, col2, col3 = st.columns([1,1,4])
+    with col1:
+        if st.button("⬅️ Sebelumnya", key=f"prev_{key}", disabled=len(stack) <= 1):
+            stack.pop()
+            st.rerun()
+    with col2:
+        if st.button("Berikutnya ➡️", key=f"next_{key}", disabled=next_cursor is None):
+            stack.append(next_cursor)
+            st.rerun()
+    col3.caption(f"Halaman {len(stack)}")
+    return (len(stack) - 1) * PAGE_SIZE
+
+# ---------------------------
+# Helper: Laporan waktu startup/rerun (admin)
+# ---------------------------
+def timing_report():
+    times = sorted(st.session_state.rerun_ms)
+    with st.sidebar.expander("⏱ Waktu startup & rerun"):
+        st.caption(f"Bootstrap: {BOOT['total_ms']:.0f} ms (sekali per proses, {BOOT['started_at']:%Y-%m-%d %H:%M} UTC)")
+        for name, ms in BOOT["timings_ms"].items():
+            st.caption(f"• {name}: {ms:.0f} ms")
+        if times:
+            st.caption(f"Rerun: terakhir {st.session_state.rerun_ms[-1]:.0f} ms, "
+                       f"median {times[len(times) // 2]:.0f} ms dari {len(times)} rerun")
+            st.caption(f"Query MongoDB rerun terakhir: {st.session_state.get('rerun_queries', 0)}")
+        frag = st.session_state.fragment_ms
+        if frag:
+            name, ms, queries = frag[-1]
+            frag_times = sorted(f[1] for f in frag)
+            st.caption(f"Rerun fragment: terakhir {ms:.0f} ms ({name}, {queries} query), "
+                       f"median {frag_times[len(frag_times) // 2]:.0f} ms dari {len(frag_times)}")
+        for err in BOOT["index_errors"]:
+            st.warning(err)
+
 # ---------------------------
 # UI: Header
 # ---------------------------
@@ -68,10 +582,9 @@ def page_login():
         if not email or not password:
             st.error("Harap isi semua field.")
         else:
-            ok, res = login_user(email.strip(), password)
+            ok, res = login_user(email.strip(), password, ip=client_ip())
             if ok:
-                st.session_state.logged_in = True
-                st.session_state.user = res
+                start_session(res)
                 st.rerun()
             else:
                 st.error(res)
@@ -120,31 +633,37 @@ def page_dashboard():
     if role == "admin":
         menu_items.append("Kelola Kategori")
         menu_items.append("Manajemen User")
+        menu_items.append("Performance")
     menu_items.append("Logout")
 
-    choice = st.sidebar.radio("Menu", menu_items)
+    choice = st.sidebar.radio("Menu", menu_items, key="menu")
+    if role == "admin":
+        timing_report()
 
     # ----------------- Dashboard -----------------
     if choice == "Dashboard":
         st.title("Dashboard")
-        docs = list_documents()
-        total = len(docs)
-        st.metric("Total Dokumen", total)
+        stats = get_dashboard_stats()
+        col_total, col_bytes = st.columns(2)
+        col_total.metric("Total Dokumen", stats["total"])
+        col_bytes.metric("Total Ukuran", f"{stats['bytes'] / 1e6:.1f} MB")
+        if role == "admin":
+            ds = get_dedup_stats()
+            st.metric("Penghematan deduplikasi", f"{ds['saved_bytes'] / 1e6:.1f} MB",
+                      help=f"{ds['refs']} referensi ke {ds['blobs']} file unik")
 
         cats = list_categories()
         counts = {c: 0 for c in cats}
-        for d in docs:
-            counts[d.get("category", "Lainnya")] = counts.get(d.get("category", "Lainnya"), 0) + 1
+        counts.update(stats["per_category"])
         st.subheader("Jumlah dokumen per kategori")
         df_cat = pd.DataFrame([{"Kategori": k, "Jumlah": v} for k, v in counts.items()])
         st.dataframe(df_cat)
 
-        per_month = {}
-        for d in docs:
-            dt = d.get("uploaded_at")
-            if dt:
-                ym = dt.strftime("%Y-%m")
-                per_month[ym] = per_month.get(ym, 0) + 1
+        st.subheader("Jumlah dokumen per tahun")
+        if stats["per_year"]:
+            st.dataframe(pd.DataFrame([{"Tahun": k, "Jumlah": v} for k, v in stats["per_year"].items()]))
+
+        per_month = stats["per_month"]
         st.subheader("Upload per bulan")
         if per_month:
             df_month = pd.DataFrame(sorted(
@@ -165,92 +684,85 @@ def page_dashboard():
     # ----------------- Kelola Dokumen Anda -----------------
     elif choice == "Kelola Dokumen Anda":
         st.title("Dokumen Anda")
-        docs = list_documents({"uploader_id": user["_id"]})
+        cursor = pager_cursor("own")
+        docs, next_cursor = list_documents_page({"uploader_id": user["_id"]}, PAGE_SIZE, cursor)
         if not docs:
             st.info("Anda belum mengupload dokumen.")
         else:
+            batch_actions("own", docs, can_delete=True, can_edit=True, owner_id=user["_id"])
+            pager_controls("own", next_cursor)
+            reset_rows(docs)
             for d in docs:
-                doc_id = str(d["_id"])
-                st.markdown(f"### {d.get('title')}")
-                st.write(f"Kategori: {d.get('category')}  • Tahun: {d.get('year')}")
-                st.write(f"Deskripsi: {d.get('description', '')}")
-                st.write(f"Uploaded: {d.get('uploaded_at')}")
-
-                # ---- Tombol aksi ----
-                col1, col2, col3, col4 = st.columns([1,1,1,1])
-                with col1:
-                    if os.path.exists(d.get("file_path","")):
-                        with open(d["file_path"], "rb") as f:
-                            file_bytes = f.read()
-                            st.download_button("Download", file_bytes, file_name=d.get("original_filename", "dokumen.pdf"), key=f"dl_{doc_id}")
-                with col2:
-                    with st.expander("Preview Dokumen"):
-                        if os.path.exists(d.get("file_path","")):
-                            preview_pdf_inline(d["file_path"], height=400)
-                with col3:
-                    if st.button("Edit Metadata", key=f"edit_{doc_id}"):
-                        st.session_state[f"editing_{doc_id}"] = True
-                        st.rerun()
-                with col4:
-                    if st.button("Hapus", key=f"hapus_self_{doc_id}"):
-                        ok = delete_document(doc_id)
-                        if ok:
-                            st.success("Dokumen dihapus.")
-                            st.rerun()
-                # ---- Form Edit Metadata ----
-                if st.session_state.get(f"editing_{doc_id}", False):
-                    st.subheader("Edit Metadata")
-                    new_title = st.text_input("Judul", value=d.get("title",""), key=f"title_{doc_id}")
-                    new_desc = st.text_area("Deskripsi", value=d.get("description",""), key=f"desc_{doc_id}")
-                    new_cat = st.selectbox("Kategori", list_categories(), index=list_categories().index(d.get("category")) if d.get("category") in list_categories() else 0, key=f"cat_{doc_id}")
-                    new_year = st.number_input("Tahun", min_value=1900, max_value=2100, value=int(d.get("year", datetime.utcnow().year)), key=f"year_{doc_id}")
-                    if st.button("Simpan", key=f"simpan_{doc_id}"):
-                        ok = update_metadata(doc_id, {
-                            "title": new_title.strip(),
-                            "description": new_desc.strip(),
-                            "category": new_cat,
-                            "year": int(new_year)
-                        })
-                        if ok:
-                            st.success("Metadata diperbarui.")
-                            st.session_state[f"editing_{doc_id}"] = False
-                            st.rerun()
-                    if st.button("Batal", key=f"batal_{doc_id}"):
-                        st.session_state[f"editing_{doc_id}"] = False
-                        st.rerun()
-
+                select_checkbox("own", str(d["_id"]))
+                document_row(d, "own", can_edit=True, can_delete=True)
                 st.markdown("---")
 
     # ----------------- Upload -----------------
     elif choice == "Upload Dokumen":
         st.title("Upload Dokumen")
-        with st.form("upload_form"):
-            title = st.text_input("Judul dokumen")
-            category = st.selectbox("Kategori", list_categories())
-            description = st.text_area("Deskripsi singkat")
-            year = st.number_input("Tahun dokumen", min_value=1900, max_value=2100, value=datetime.utcnow().year)
-            file = st.file_uploader("Pilih file PDF", type=["pdf"])
-            submitted = st.form_submit_button("Upload")
-        if submitted:
-            if not title or not file:
-                st.error("Judul dan file wajib diisi.")
-            else:
-                doc_id = upload_document(title.strip(), category, description.strip(), year, file, user["_id"])
-                st.success("Dokumen berhasil diupload (ID: %s)" % doc_id)
+        mode = st.radio("Mode", ["Satu dokumen", "Banyak dokumen (bulk)"], horizontal=True)
+        if mode == "Satu dokumen":
+            with st.form("upload_form"):
+                title = st.text_input("Judul dokumen")
+                category = st.selectbox("Kategori", list_categories())
+                description = st.text_area("Deskripsi singkat")
+                year = st.number_input("Tahun dokumen", min_value=1900, max_value=2100, value=datetime.utcnow().year)
+                file = st.file_uploader("Pilih file PDF", type=["pdf"])
+                submitted = st.form_submit_button("Upload")
+            if submitted:
+                if not title or not file:
+                    st.error("Judul dan file wajib diisi.")
+                else:
+                    try:
+                        doc_id = upload_document(title.strip(), category, description.strip(), year, file, user["_id"])
+                        st.success("Dokumen berhasil diupload (ID: %s)" % doc_id)
+                    except UploadRejected as e:
+                        st.error(f"Upload ditolak: {e}")
+        else:
+            with st.form("bulk_upload_form"):
+                st.caption("Judul diambil dari nama file. Kategori, tahun dan deskripsi berlaku untuk semua file.")
+                category = st.selectbox("Kategori", list_categories())
+                description = st.text_area("Deskripsi singkat")
+                year = st.number_input("Tahun dokumen", min_value=1900, max_value=2100, value=datetime.utcnow().year)
+                files = st.file_uploader("Pilih file PDF", type=["pdf"], accept_multiple_files=True)
+                submitted = st.form_submit_button("Upload semua")
+            if submitted:
+                if not files:
+                    st.error("Pilih minimal satu file.")
+                else:
+                    items = [{
+                        "filename": f.name,
+                        "open": (lambda f=f: f),
+                        "close": False,
+                        "title": os.path.splitext(f.name)[0],
+                        "category": category,
+                        "description": description.strip(),
+                        "year": int(year),
+                    } for f in files]
+                    bar = st.progress(0.0, text="Mengupload...")
+                    result = bulk_upload_documents(
+                        items, user["_id"],
+                        progress=lambda done, total: bar.progress(done / total, text=f"{done}/{total} file"))
+                    st.success(f"{len(result['inserted'])} dokumen berhasil diupload.")
+                    for name, err in result["failed"]:
+                        st.error(f"{name}: {err}")
 
     # ----------------- Lihat Arsip -----------------
     elif choice == "Lihat Arsip":
         st.title("Daftar Dokumen")
-        docs = list_documents()
+        inventory_export()
+        cursor = pager_cursor("arsip")
+        docs, next_cursor = list_documents_page(None, PAGE_SIZE, cursor)
         if not docs:
             st.info("Belum ada dokumen.")
         else:
             # mapping user id -> nama
-            user_map = {str(u["_id"]): u.get("name", "Unknown") for u in users_col.find()}
+            user_map = get_user_names()
 
             st.subheader("📑 Tabel Daftar Dokumen")
+            offset = pager_controls("arsip", next_cursor)
             table_data = []
-            for i, d in enumerate(docs, start=1):
+            for i, d in enumerate(docs, start=offset + 1):
                 uploader_name = user_map.get(str(d.get("uploader_id")), d.get("uploader_id"))
                 table_data.append({
                     "No": i,
@@ -264,53 +776,23 @@ def page_dashboard():
             st.dataframe(df_table, use_container_width=True)
 
             st.markdown("---")
+            batch_actions("arsip", docs, can_delete=(role == "admin"), can_edit=(role == "admin"))
+            reset_rows(docs)
             for d in docs:
-                doc_id = str(d["_id"])
                 uploader_name = user_map.get(str(d.get("uploader_id")), d.get("uploader_id"))
-
-                cols = st.columns([4,1,1,1])
-                with cols[0]:
-                    st.markdown(
-                        f"**{d.get('title')}**  \n"
-                        f"Kategori: {d.get('category')}  • Tahun: {d.get('year')}  \n"
-                        f"Uploader: {uploader_name}  \n"
-                        f"Uploaded: {d.get('uploaded_at')}"
-                    )
-                    st.write(d.get("description", ""))
-                with cols[1]:
-                    if os.path.exists(d.get("file_path","")):
-                        with open(d["file_path"], "rb") as f:
-                            file_bytes = f.read()
-                            st.download_button("Download", file_bytes, file_name=d.get("original_filename", "dokumen.pdf"))
-
-                with cols[2]:
-                    if (role == "admin") or (str(user["_id"]) == str(d["uploader_id"])):
-                        if st.button(f"Edit", key=f"edit_{doc_id}"):
-                            st.session_state[f"editing_{doc_id}"] = True
-                with cols[3]:
-                    if role == "admin":
-                        if st.button("Hapus", key=f"hapus_{doc_id}"):
-                            ok = delete_document(doc_id)
-                            if ok:
-                                st.success("Dokumen dihapus.")
-                                st.rerun()
-
-                with st.expander("Preview Dokumen"):
-                    if os.path.exists(d.get("file_path","")):
-                        preview_pdf_inline(d["file_path"], height=600)
-                    else:
-                        st.error("File tidak tersedia di server.")
+                select_checkbox("arsip", str(d["_id"]))
+                document_row(d, "arsip",
+                             can_edit=(role == "admin") or (str(user["_id"]) == str(d["uploader_id"])),
+                             can_delete=(role == "admin"), uploader_name=uploader_name)
                 st.markdown("---")
 
     # ----------------- Pencarian -----------------
     elif choice == "Pencarian & Filter":
         st.title("Pencarian & Filter")
-        q_title = st.text_input("Cari judul (substring)")
+        q_text = st.text_input("Kata kunci (judul, deskripsi, isi dokumen)")
         q_cat = st.selectbox("Kategori", [""] + list_categories())
         q_year = st.text_input("Tahun (kosong = semua)")
         query = {}
-        if q_title:
-            query["title"] = {"$regex": q_title, "$options": "i"}
         if q_cat:
             query["category"] = q_cat
         if q_year:
@@ -318,42 +800,32 @@ def page_dashboard():
                 query["year"] = int(q_year)
             except:
                 st.error("Format tahun salah")
-        docs = list_documents(query)
-        st.write(f"Hasil: {len(docs)} dokumen")
+        cursor = pager_cursor("search", reset_on=(q_text, q_cat, q_year))
+        if q_text.strip():
+            page = cursor or 0
+            docs, total = search_documents(q_text.strip(), query, page, PAGE_SIZE)
+            next_cursor = page + 1 if (page + 1) * PAGE_SIZE < total else None
+        else:
+            docs, next_cursor = list_documents_page(query, PAGE_SIZE, cursor)
+            total = count_documents(query)
+        st.write(f"Hasil: {total} dokumen")
+        pager_controls("search", next_cursor)
         for d in docs:
             st.write(f"**{d.get('title')}** — {d.get('category')} ({d.get('year')})")
-            if os.path.exists(d.get("file_path","")):
-                with open(d["file_path"], "rb") as f:
-                    file_bytes = f.read()
-                    st.download_button("Download", file_bytes, file_name=d.get("original_filename", "dokumen.pdf"))
+            if d.get("snippet"):
+                st.caption("… " + d["snippet"] + " …")
+            lazy_download(d, f"search_{d['_id']}")
             st.markdown("---")
 
     # ----------------- Kelola Kategori (Admin) -----------------
     elif choice == "Kelola Kategori" and role == "admin":
         st.title("Kelola Kategori")
-        st.subheader("Tambah Kategori")
-        new_cat = st.text_input("Nama kategori baru")
-        if st.button("Tambah"):
-            if not new_cat.strip():
-                st.error("Nama kategori tidak boleh kosong.")
-            elif add_category(new_cat.strip()):
-                st.success("Kategori ditambahkan")
-            else:
-                st.error("Kategori sudah ada")
-        st.subheader("Daftar Kategori")
-        cats = list_categories()
-        for c in cats:
-            col1, col2 = st.columns([4,1])
-            col1.write(c)
-            if col2.button("Hapus", key=f"delcat_{c}"):
-                remove_category(c)
-                st.success("Kategori dihapus")
-                st.rerun()
+        category_manager()
 
     # ----------------- Manajemen User (Admin) -----------------
     elif choice == "Manajemen User" and role == "admin":
         st.title("Manajemen User")
-        users = list(users_col.find())
+        users = list(users_col.find({}, {"password": 0}))
         df = pd.DataFrame([{
             "id": str(u["_id"]),
             "name": u.get("name"),
@@ -378,19 +850,86 @@ def page_dashboard():
                 else:
                     st.error(msg)
 
+        st.subheader("Ubah role / status user")
+        by_label = {f"{u.get('name')} <{u.get('email')}>": u for u in users}
+        if by_label:
+            label = st.selectbox("User", list(by_label), key="uu_user")
+            target = by_label[label]
+            roles = ["admin", "staf", "viewer"]
+            uu_role = st.selectbox("Role", roles, index=roles.index(target.get("role")) if target.get("role") in roles else 2, key="uu_role")
+            uu_active = st.checkbox("Aktif", value=target.get("active", True), key="uu_active")
+            if st.button("Simpan perubahan"):
+                if update_user(target["_id"], role=uu_role, active=uu_active):
+                    st.success("User diperbarui. Sesi aktif user ini ikut diperbarui.")
+                    st.rerun()
+                else:
+                    st.error("User tidak ditemukan.")
+
+    # ----------------- Performance (Admin) -----------------
+    elif choice == "Performance" and role == "admin":
+        st.title("Performance")
+        if not metrics.ENABLED:
+            st.info("Metrik nonaktif. Set METRICS_ENABLED=1 lalu restart aplikasi.")
+        else:
+            snap = metrics.snapshot()
+            st.caption(f"Sejak {datetime.utcfromtimestamp(snap['since']):%Y-%m-%d %H:%M:%S} UTC (per proses)")
+            rows = [{"Nama": k, **v} for k, v in sorted(snap["timers"].items())]
+            st.subheader("Render & menu")
+            st.dataframe(pd.DataFrame([r for r in rows if not r["Nama"].startswith("mongo.")]), use_container_width=True)
+            st.subheader("Command MongoDB")
+            st.dataframe(pd.DataFrame([r for r in rows if r["Nama"].startswith("mongo.")]), use_container_width=True)
+            st.subheader("Counter")
+            st.dataframe(pd.DataFrame([{"Nama": k, "Nilai": v} for k, v in sorted(snap["counters"].items())]),
+                         use_container_width=True)
+            if metrics.DUMP_PATH:
+                st.caption(f"Snapshot ditulis ke {metrics.DUMP_PATH} setiap {metrics.DUMP_INTERVAL} detik.")
+            if st.button("Reset metrik"):
+                metrics.reset()
+                st.rerun()
+
+        st.subheader("Job pemeliharaan")
+        c1, c2, c3 = st.columns(3)
+        if c1.button("Cari file yatim & file hilang"):
+            jobs.enqueue("orphan_scan", {"delete": False}, key="orphan_scan")
+        if c2.button("Verifikasi checksum"):
+            jobs.enqueue("verify_checksums", key="verify_checksums")
+        if c3.button("Muat ulang daftar job"):
+            st.rerun()
+        st.caption("Job selain file_delete dikerjakan oleh `python jobs.py worker`.")
+        job_rows = [{
+            "Jenis": j["type"],
+            "Status": j["state"],
+            "Dibuat": j.get("created_at"),
+            "Selesai": j.get("finished_at"),
+            "Progress": ", ".join(f"{k}={v}" for k, v in (j.get("progress") or {}).items()
+                                  if not k.endswith("_sample")),
+            "Error": j.get("error") or "",
+        } for j in jobs.list_jobs(20)]
+        if job_rows:
+            st.dataframe(pd.DataFrame(job_rows), use_container_width=True)
+
     # ----------------- Logout -----------------
     elif choice == "Logout":
-        st.session_state.logged_in = False
-        st.session_state.user = None
+        end_session()
         st.rerun()
 
 # ---------------------------
 # Routing Auth
 # ---------------------------
+restore_session()
 if not st.session_state.logged_in:
-    if st.session_state.auth_page == "login":
-        page_login()
-    elif st.session_state.auth_page == "register":
-        page_register()
+    with metrics.timer(f"render.{st.session_state.auth_page}"):
+        if st.session_state.auth_page == "login":
+            page_login()
+        elif st.session_state.auth_page == "register":
+            page_register()
 else:
-    page_dashboard()
+    with metrics.timer("render.dashboard"), metrics.timer(f"menu.{st.session_state.get('menu', 'Dashboard')}"):
+        page_dashboard()
+
+elapsed_ms = (time.perf_counter() - _rerun_started) * 1000
+st.session_state.full_run = False
+st.session_state.rerun_ms.append(elapsed_ms)
+st.session_state.rerun_queries = query_counter.count()
+metrics.observe("rerun", elapsed_ms)
+logging.getLogger("app").debug("rerun %.1f ms, %d query", elapsed_ms, st.session_state.rerun_queries)
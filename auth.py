@@ -1,17 +1,97 @@
 # auth.py
 import os
+import threading
+import time
 import bcrypt
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 from db import users_col
+from sessions import invalidate_user_sessions
+from utils import get_secret as _get_secret, TTLCache
 
-def _get_secret(key: str, default=None):
+USER_NAMES_TTL = int(os.getenv("USER_NAMES_TTL", "300"))
+_user_names_cache = TTLCache(USER_NAMES_TTL)
+
+# ---------------------------
+# Hashing bcrypt di worker pool terbatas
+# bcrypt melepas GIL, jadi hashing di thread pool tidak menahan rerun sesi lain;
+# jumlah worker membatasi berapa core yang bisa dipakai untuk hashing.
+# ---------------------------
+BCRYPT_ROUNDS = int(_get_secret("BCRYPT_ROUNDS", 12))
+AUTH_WORKERS = int(_get_secret("AUTH_WORKERS", 2))
+AUTH_MAX_PENDING = int(_get_secret("AUTH_MAX_PENDING", 16))
+AUTH_WAIT_SECONDS = 10
+LOGIN_WINDOW = int(_get_secret("LOGIN_WINDOW", 300))
+LOGIN_MAX_PER_EMAIL = int(_get_secret("LOGIN_MAX_PER_EMAIL", 5))
+LOGIN_MAX_PER_IP = int(_get_secret("LOGIN_MAX_PER_IP", 30))
+
+_hash_pool = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(AUTH_MAX_PENDING)
+
+class AuthBusy(Exception):
+    pass
+
+def _run_hashing(fn, *args):
+    if not _hash_slots.acquire(timeout=AUTH_WAIT_SECONDS):
+        raise AuthBusy()
+    try:
+        return _hash_pool.submit(fn, *args).result()
+    finally:
+        _hash_slots.release()
+
+def hash_password(password):
+    return _run_hashing(lambda pw: bcrypt.hashpw(pw.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)), password)
+
+def check_password(password, hashed):
+    return _run_hashing(lambda pw, h: bcrypt.checkpw(pw.encode(), h), password, hashed)
+
+def _hash_rounds(hashed):
+    # format: $2b$<cost>$...
     try:
-        import streamlit as st
-        if "secrets" in dir(st) and key in st.secrets:
-            return st.secrets[key]
-    except Exception:
-        pass
-    return os.getenv(key, default)
+        return int(bytes(hashed)[4:6])
+    except ValueError:
+        return 0
+
+class _RateLimiter:
+    """Sliding window: maks `limit` percobaan per `window` detik untuk setiap key."""
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._hits = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Catat satu percobaan. Returns False jika key sudah melewati batas."""
+        now = time.monotonic()
+        with self._lock:
+            q = self._hits.setdefault(key, deque())
+            while q and q[0] < now - self.window:
+                q.popleft()
+            if len(q) >= self.limit:
+                return False
+            q.append(now)
+            if len(self._hits) > 10000:
+                # buang key yang sudah kosong agar memori tidak tumbuh terus
+                for k in [k for k, v in self._hits.items() if not v or v[-1] < now - self.window]:
+                    del self._hits[k]
+            return True
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+_email_limiter = _RateLimiter(LOGIN_MAX_PER_EMAIL, LOGIN_WINDOW)
+_ip_limiter = _RateLimiter(LOGIN_MAX_PER_IP, LOGIN_WINDOW)
+
+def get_user_names():
+    """Mapping id user (str) -> nama, di-cache lintas sesi."""
+    return _user_names_cache.get_or_load(
+        "all", lambda: {str(u["_id"]): u.get("name", "Unknown") for u in users_col.find({}, {"name": 1})})
+
+def invalidate_user_cache():
+    _user_names_cache.clear()
 
 def create_admin_if_not_exists():
     email = _get_secret("ADMIN_EMAIL")
@@ -23,7 +103,7 @@ def create_admin_if_not_exists():
     if users_col.find_one({"email": email}):
         return False
 
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed = hash_password(password)
     users_col.insert_one({
         "name": name,
         "email": email,
@@ -32,31 +112,67 @@ def create_admin_if_not_exists():
         "active": True,
         "created_at": datetime.utcnow()
     })
+    invalidate_user_cache()
     return True
 
 def register_user(name, email, password, role="staf"):
     if users_col.find_one({"email": email}):
         return False, "Email sudah terdaftar"
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-    users_col.insert_one({
-        "name": name,
-        "email": email,
-        "password": hashed,
-        "role": role,
-        "active": True,
-        "created_at": datetime.utcnow()
-    })
+    try:
+        hashed = hash_password(password)
+    except AuthBusy:
+        return False, "Server sedang sibuk, coba lagi sebentar."
+    try:
+        users_col.insert_one({
+            "name": name,
+            "email": email,
+            "password": hashed,
+            "role": role,
+            "active": True,
+            "created_at": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return False, "Email sudah terdaftar"
+    invalidate_user_cache()
     return True, "Registrasi berhasil"
 
-def login_user(email, password):
+def login_user(email, password, ip=None):
+    key = email.lower()
+    if not _email_limiter.hit(key) or (ip and not _ip_limiter.hit(ip)):
+        return False, "Terlalu banyak percobaan login. Coba lagi beberapa menit lagi."
     user = users_col.find_one({"email": email, "active": True})
     if not user:
         return False, "Akun tidak ditemukan atau nonaktif"
-    if bcrypt.checkpw(password.encode(), user["password"]):
+    try:
+        ok = check_password(password, user["password"])
+    except AuthBusy:
+        return False, "Server sedang sibuk, coba lagi sebentar."
+    if ok:
+        _email_limiter.reset(key)
+        if _hash_rounds(user["password"]) < BCRYPT_ROUNDS:
+            # naikkan cost hash lama saat password diketahui benar
+            try:
+                users_col.update_one({"_id": user["_id"]}, {"$set": {"password": hash_password(password)}})
+            except AuthBusy:
+                pass
         user.pop("password", None)  # hapus hash dari dict
         return True, user
     return False, "Email atau password salah"
 
+def update_user(user_id, role=None, active=None):
+    """Ubah role/status user; sesi aktif user tersebut divalidasi ulang (atau dicabut jika dinonaktifkan)."""
+    data = {}
+    if role is not None:
+        data["role"] = role
+    if active is not None:
+        data["active"] = bool(active)
+    if not data:
+        return False
+    res = users_col.update_one({"_id": user_id}, {"$set": data})
+    invalidate_user_cache()
+    invalidate_user_sessions(user_id, revoke=(active is False))
+    return res.matched_count > 0
+
 def reset_admin_user():
     """
     Hapus admin lama (berdasarkan ADMIN_EMAIL) dan buat ulang dengan password dari secrets/env.
@@ -72,7 +188,7 @@ def reset_admin_user():
     users_col.delete_many({"email": email})
 
     # buat admin baru
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed = hash_password(password)
     users_col.insert_one({
         "name": name,
         "email": email,
@@ -81,5 +197,6 @@ def reset_admin_user():
         "active": True,
         "created_at": datetime.utcnow()
     })
+    invalidate_user_cache()
 
     return True, f"✅ Admin berhasil direset: {email}"
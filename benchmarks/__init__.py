@@ -0,0 +1,9 @@
+"""
+Suite benchmark aplikasi arsip.
+
+    python -m benchmarks.run --scales 1000,100000,1000000 --out bench.json
+
+Lihat benchmarks/run.py untuk skenario, dan benchmarks/synth.py untuk
+generator data sintetis. Jalankan terhadap database terpisah (MONGO_DB),
+jangan ke database produksi.
+"""
@@ -0,0 +1,63 @@
+"""
+Benchmark login di bawah N sesi bersamaan: latensi p50/p99 login_user dan
+throughput, dengan hashing bcrypt lewat worker pool auth.py.
+Butuh MongoDB (MONGO_URI); user uji dibuat lalu dihapus lagi.
+
+    python benchmarks/bench_login.py --sessions 20 --logins 5
+    BCRYPT_ROUNDS=10 AUTH_WORKERS=4 python benchmarks/bench_login.py
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import auth  # noqa: E402
+from db import users_col  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=20, help="jumlah sesi login bersamaan")
+    ap.add_argument("--logins", type=int, default=5, help="login per sesi")
+    args = ap.parse_args()
+
+    # rate limit dimatikan: benchmark mengukur biaya hashing, bukan limiter
+    auth._email_limiter.limit = auth._ip_limiter.limit = 10 ** 9
+    emails = [f"bench-{uuid.uuid4().hex[:8]}@bench.local" for _ in range(args.sessions)]
+    for e in emails:
+        auth.register_user("Bench", e, "rahasia-bench", role="viewer")
+
+    def session(email):
+        lat = []
+        for _ in range(args.logins):
+            t0 = time.perf_counter()
+            ok, _ = auth.login_user(email, "rahasia-bench")
+            lat.append((time.perf_counter() - t0) * 1000)
+            assert ok
+        return lat
+
+    try:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            latencies = [ms for lat in pool.map(session, emails) for ms in lat]
+        elapsed = time.perf_counter() - t0
+    finally:
+        users_col.delete_many({"email": {"$in": emails}})
+        auth.invalidate_user_cache()
+
+    print(f"rounds={auth.BCRYPT_ROUNDS} workers={auth.AUTH_WORKERS} sessions={args.sessions} "
+          f"logins={len(latencies)}")
+    print(f"p50={percentile(latencies, 50):.0f} ms  p99={percentile(latencies, 99):.0f} ms  "
+          f"throughput={len(latencies) / elapsed:.1f} login/s")
+
+
+if __name__ == "__main__":
+    main()
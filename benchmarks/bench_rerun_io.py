@@ -0,0 +1,77 @@
+"""
+Benchmark I/O per rerun halaman "Lihat Arsip": mode eager (lama) vs lazy.
+Mode eager meniru kode lama: setiap baris membaca seluruh PDF untuk tombol
+download dan meng-encode base64 untuk preview. Mode lazy hanya mengecek
+keberadaan file, kecuali untuk baris yang di-"siapkan" oleh user; file di atas
+INLINE_MAX_BYTES tidak dibaca (app menampilkan pesan/link file server).
+
+    python benchmarks/bench_rerun_io.py --docs 200 --size-mb 5 --prepared 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import base64  # noqa: E402
+from utils import read_file_bytes, inline_allowed  # noqa: E402
+
+
+def make_files(dirname, n, size):
+    paths = []
+    block = b"%PDF-1.4\n" + os.urandom(size - 9)
+    for i in range(n):
+        p = os.path.join(dirname, f"doc_{i}.pdf")
+        with open(p, "wb") as f:
+            f.write(block)
+        paths.append(p)
+    return paths
+
+
+def _read_unbounded(p):
+    # kode lama membaca file tanpa batas ukuran
+    with open(p, "rb") as f:
+        return f.read()
+
+
+def rerun_eager(paths):
+    nbytes = 0
+    for p in paths:
+        if os.path.exists(p):
+            nbytes += len(_read_unbounded(p))                     # download_button
+            nbytes += len(base64.b64encode(_read_unbounded(p)))   # preview_pdf_inline di expander
+    return nbytes
+
+
+def rerun_lazy(paths, prepared):
+    nbytes = 0
+    for i, p in enumerate(paths):
+        if os.path.exists(p) and i < prepared and inline_allowed(p, os.path.getsize(p)):
+            nbytes += len(read_file_bytes(p))
+    return nbytes
+
+
+def measure(fn, *args):
+    t0 = time.perf_counter()
+    nbytes = fn(*args)
+    return nbytes, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=200)
+    ap.add_argument("--size-mb", type=float, default=2)
+    ap.add_argument("--prepared", type=int, default=1,
+                    help="jumlah baris yang download-nya disiapkan user")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_files(tmp, args.docs, int(args.size_mb * 1024 * 1024))
+        for name, fn, extra in [("eager", rerun_eager, ()), ("lazy", rerun_lazy, (args.prepared,))]:
+            nbytes, elapsed = measure(fn, paths, *extra)
+            print(f"{name:6s} docs={args.docs} bytes/rerun={nbytes / 1e6:10.1f} MB  time/rerun={elapsed * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark jalur utama aplikasi di atas arsip sintetis.
+
+Untuk setiap skala (jumlah dokumen) database diisi sampai ukuran itu
+(inkremental, jadi 1k -> 100k -> 1M tidak mengulang dari nol), lalu setiap
+skenario dijalankan --repeat kali. Hasil (p50/p90/p99, rata-rata, ops/detik)
+ditulis ke JSON.
+
+    MONGO_URI=mongodb://localhost MONGO_DB=e_arsip_bench BCRYPT_ROUNDS=10 \\
+        python -m benchmarks.run --scales 1000,100000,1000000 --out bench.json
+    python -m benchmarks.run --mongomock --scales 1000
+
+Gunakan database dan --workdir terpisah: data benchmark tidak dibersihkan
+(kecuali --reset) agar skala berikutnya bisa melanjutkan. Dengan --mongomock
+skenario yang tidak didukung mongomock ($text, GridFS) dicatat sebagai error.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def measure(fn, repeat, warmup=2):
+    """Jalankan fn() berulang; returns ringkasan latensi (ms) & throughput."""
+    for _ in range(warmup):
+        fn()
+    lat = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        lat.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - start
+    return {
+        "n": repeat,
+        "p50_ms": round(percentile(lat, 50), 3),
+        "p90_ms": round(percentile(lat, 90), 3),
+        "p99_ms": round(percentile(lat, 99), 3),
+        "mean_ms": round(sum(lat) / len(lat), 3),
+        "ops_per_s": round(repeat / total, 2) if total else None,
+    }
+
+
+def scenarios(ctx, rng):
+    """Skenario benchmark: nama -> fungsi tanpa argumen."""
+    import auth
+    import documents
+    from search import search_documents
+    from storage import iter_file
+    from utils import read_file_bytes, file_to_base64, INLINE_MAX_BYTES
+    from benchmarks.synth import NamedBytes, make_pdf, random_text
+
+    users, cats, years, files = ctx["users"], ctx["categories"], ctx["years"], ctx["files"]
+    small = [p for p, size in files if size <= 2 * 1024 * 1024] or [files[0][0]]
+    # read_file_bytes menolak file > INLINE_MAX_BYTES; file besar diukur lewat stream
+    inline = [p for p, size in files if size <= INLINE_MAX_BYTES] or small
+
+    def page(filters_fn):
+        return lambda: documents.list_documents_page(filters_fn())
+
+    def deep_page():
+        cursor = None
+        for _ in range(10):
+            _, cursor = documents.list_documents_page({}, cursor=cursor)
+            if cursor is None:
+                break
+
+    def dashboard_cold():
+        documents._invalidate_stats()
+        documents.get_dashboard_stats()
+
+    def upload():
+        data = make_pdf(random_text(rng, 40), rng.randrange(50_000, 2_000_000))
+        documents.upload_document(random_text(rng, 5).title(), rng.choice(cats), "benchmark",
+                                  rng.choice(years), NamedBytes(data, "bench_upload.pdf"),
+                                  rng.choice(users))
+
+    return {
+        "list_page.all": page(lambda: {}),
+        "list_page.uploader": page(lambda: {"uploader_id": rng.choice(users)}),
+        "list_page.category": page(lambda: {"category": rng.choice(cats)}),
+        "list_page.year": page(lambda: {"year": rng.choice(years)}),
+        "list_page.category_year": page(lambda: {"category": rng.choice(cats),
+                                                 "year": rng.choice(years)}),
+        "list_page.deep_10": deep_page,
+        "count.category": lambda: documents.count_documents({"category": rng.choice(cats)}),
+        "dashboard.cold": dashboard_cold,
+        "dashboard.warm": documents.get_dashboard_stats,
+        "search.one_term": lambda: search_documents(rng.choice(ctx["words"])),
+        "search.two_terms_year": lambda: search_documents(
+            " ".join(rng.sample(ctx["words"], 2)), {"year": rng.choice(years)}),
+        "login": lambda: auth.login_user(rng.choice(ctx["emails"]), ctx["password"]),
+        "upload": upload,
+        "download.full": lambda: read_file_bytes(rng.choice(inline)),
+        "download.stream_full": lambda: sum(len(b) for b in iter_file(rng.choice(files)[0])),
+        "download.range_1mb": lambda: sum(len(b) for b in iter_file(
+            rng.choice(files)[0], 0, 1024 * 1024 - 1)),
+        "preview.base64": lambda: file_to_base64(rng.choice(small)),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--scales", default="1000", help="jumlah dokumen, dipisah koma (mis. 1000,100000,1000000)")
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--categories", type=int, default=20)
+    ap.add_argument("--files", type=int, default=40, help="jumlah PDF fisik dalam pool")
+    ap.add_argument("--max-file-mb", type=float, default=None, help="batasi ukuran PDF sintetis")
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--only", default="", help="jalankan skenario berawalan ini saja (dipisah koma)")
+    ap.add_argument("--workdir", default="bench_data", help="direktori kerja (storage/ dibuat di sini)")
+    ap.add_argument("--mongomock", action="store_true", help="pakai mongomock, bukan MongoDB")
+    ap.add_argument("--reset", action="store_true", help="hapus database benchmark sebelum mulai")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="bench_results.json")
+    args = ap.parse_args()
+
+    out_path = os.path.abspath(args.out)
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+    os.environ.setdefault("MONGO_DB", "e_arsip_bench")
+    if args.mongomock:
+        import mongomock
+        import mongomock.gridfs
+        import pymongo
+        mongomock.gridfs.enable_gridfs_integration()
+        pymongo.MongoClient = mongomock.MongoClient
+    elif not os.getenv("MONGO_URI"):
+        sys.exit("MONGO_URI belum di-set (atau gunakan --mongomock)")
+
+    import auth
+    from db import client, DB_NAME
+    from indexes import ensure_indexes
+    from documents import ensure_default_categories
+    import stats
+    from benchmarks import synth
+
+    if DB_NAME == "e_arsip" and not args.mongomock:
+        sys.exit("MONGO_DB menunjuk ke database produksi; gunakan database terpisah")
+    if args.reset:
+        client.drop_database(DB_NAME)
+
+    # benchmark mengukur hashing & query, bukan rate limiter
+    auth._email_limiter.limit = auth._ip_limiter.limit = 10 ** 9
+    index_errors = ensure_indexes()
+    ensure_default_categories()
+
+    password = "bench-password"
+    t0 = time.perf_counter()
+    user_ids, emails = synth.generate_users(args.users, password)
+    categories = synth.generate_categories(args.categories)
+    files = synth.generate_files(args.files, seed=args.seed, max_mb=args.max_file_mb)
+    setup_s = time.perf_counter() - t0
+
+    only = [p for p in args.only.split(",") if p]
+    report = {
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "backend": os.getenv("STORAGE_BACKEND", "cas"),
+        "mongomock": args.mongomock,
+        "env": {k: os.getenv(k) for k in ("BCRYPT_ROUNDS", "AUTH_WORKERS", "STORAGE_CHUNKED",
+                                          "STORAGE_COMPRESSION") if os.getenv(k)},
+        "index_errors": index_errors,
+        "setup_s": round(setup_s, 2),
+        "files": [{"path": p, "size": s} for p, s in files],
+        "scales": [],
+    }
+    for scale in [int(s) for s in args.scales.split(",")]:
+        print(f"== {scale} dokumen ==")
+        t0 = time.perf_counter()
+        synth.generate_documents(
+            scale, user_ids, categories, files, seed=args.seed,
+            progress=lambda n, k: print(f"  isi data {n}/{k}", end="\r"))
+        stats.reconcile()
+        fill_s = time.perf_counter() - t0
+        rng = random.Random(args.seed)
+        ctx = {"users": user_ids, "emails": emails, "password": password,
+               "categories": categories, "files": files, "words": synth.WORDS,
+               "years": sorted({datetime.utcnow().year - i for i in range(5)})}
+        results = {}
+        for name, fn in scenarios(ctx, rng).items():
+            if only and not any(name.startswith(p) for p in only):
+                continue
+            try:
+                results[name] = measure(fn, args.repeat)
+            except Exception as e:  # skenario tidak didukung (mis. $text di mongomock)
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+            r = results[name]
+            print(f"  {name:<26} " + (f"p50 {r['p50_ms']:>9.2f} ms  p99 {r['p99_ms']:>9.2f} ms  "
+                                       f"{r['ops_per_s']:>8.1f} op/s" if "error" not in r else r["error"]))
+        report["scales"].append({"documents": scale, "fill_s": round(fill_s, 2), "results": results})
+        with open(out_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    print(f"Hasil ditulis ke {out_path}")
+
+
+if __name__ == "__main__":
+    main()
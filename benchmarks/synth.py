@@ -0,0 +1,137 @@
+"""
+Generator arsip sintetis: user, kategori, PDF dengan ukuran realistis dan
+dokumen dalam jumlah besar.
+
+File PDF dibuat sebagai pool kecil (--files) lalu dipakai ulang oleh banyak
+dokumen; membuat satu juta file fisik tidak realistis di mesin benchmark,
+sedangkan jalur baca file hanya butuh sampel ukuran yang representatif.
+"""
+import io
+import os
+import random
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+
+WORDS = ("surat keputusan berita acara rapat pleno rekapitulasi suara pemilu pilkada "
+         "anggaran belanja honorarium panitia pemungutan kecamatan kelurahan daftar pemilih "
+         "tetap logistik distribusi kotak surat suara verifikasi partai calon legislatif "
+         "kampanye laporan dana sosialisasi pengadaan barang jasa kontrak pegawai mutasi "
+         "cuti absensi inventaris aset pengarsipan nota dinas undangan notulen").split()
+
+# ukuran PDF (MB) & bobotnya: kebanyakan surat kecil, sebagian scan besar
+SIZE_PROFILE = [(0.1, 40), (0.5, 30), (2, 18), (10, 8), (50, 3), (150, 1)]
+
+
+class NamedBytes(io.BytesIO):
+    """Pengganti UploadedFile Streamlit (punya .name)."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def random_text(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def make_pdf(text, size):
+    """PDF satu halaman yang valid berisi `text`, diisi stream acak sampai ±size byte."""
+    content = f"BT /F1 12 Tf 50 750 Td ({text[:200]}) Tj ET".encode("latin-1", "replace")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    padding = max(size - 1024, 0)
+    if padding:
+        # data tak terkompresi, seperti gambar hasil scan
+        objects.append(b"<< /Length %d >>\nstream\n" % padding + os.urandom(padding) + b"\nendstream")
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def pick_size(rng, max_mb=None):
+    sizes, weights = zip(*[(s, w) for s, w in SIZE_PROFILE if max_mb is None or s <= max_mb])
+    return int(rng.choices(sizes, weights)[0] * 1024 * 1024 * rng.uniform(0.7, 1.3))
+
+
+def generate_users(n, password="bench-password", seed=1):
+    from auth import register_user
+    from db import users_col
+    emails = [f"bench{i}@bench.local" for i in range(n)]
+    existing = {u["email"] for u in users_col.find({"email": {"$in": emails}}, {"email": 1})}
+    for i, email in enumerate(emails):
+        if email not in existing:
+            register_user(f"Bench User {i}", email, password, role="staf")
+    return [u["_id"] for u in users_col.find({"email": {"$in": emails}}, {"_id": 1})], emails
+
+
+def generate_categories(n):
+    from documents import add_category, list_categories
+    for i in range(n):
+        add_category(f"Bench Kategori {i}")
+    return list_categories()
+
+
+def generate_files(n, seed=1, max_mb=None):
+    """Simpan n PDF sintetis lewat storage aktif. Returns list (path, size)."""
+    from storage import save_file, file_size
+    rng = random.Random(seed)
+    pool = []
+    for i in range(n):
+        data = make_pdf(random_text(rng, 40), pick_size(rng, max_mb))
+        path = save_file(NamedBytes(data, f"bench_{i}.pdf"))
+        pool.append((path, file_size(path)))
+    return pool
+
+
+def generate_documents(k, user_ids, categories, files, seed=1, batch=10000, progress=None):
+    """
+    Tambah dokumen sampai koleksi berisi k dokumen sintetis (inkremental:
+    dokumen yang sudah ada dipertahankan). Dokumen ditulis langsung dengan
+    insert_many agar skala jutaan tetap cepat.
+    """
+    from db import docs_col
+    rng = random.Random(seed + docs_col.estimated_document_count())
+    have = docs_col.count_documents({"bench": True})
+    now = datetime.utcnow()
+    created = 0
+    while have + created < k:
+        n = min(batch, k - have - created)
+        docs = []
+        for _ in range(n):
+            path, size = rng.choice(files)
+            uploaded = now - timedelta(seconds=rng.randrange(5 * 365 * 86400))
+            docs.append({
+                "_id": ObjectId(),
+                "title": random_text(rng, 6).title(),
+                "category": rng.choice(categories),
+                "description": random_text(rng, 20),
+                "year": uploaded.year,
+                "file_path": path,
+                "original_filename": os.path.basename(path),
+                "uploader_id": rng.choice(user_ids),
+                "uploaded_at": uploaded,
+                "size_bytes": size,
+                "content_text": random_text(rng, 200),
+                "bench": True,
+            })
+        docs_col.insert_many(docs, ordered=False)
+        created += n
+        if progress:
+            progress(have + created, k)
+    return created
@@ -0,0 +1,46 @@
+# bootstrap.py
+"""
+Setup sekali per proses: koneksi MongoDB, kategori default, akun admin,
+index dan worker job ringan (jobs.py). app.py memanggil run_bootstrap() lewat st.cache_resource sehingga
+rerun Streamlit tidak lagi mengulang round trip dan hashing bcrypt ini.
+"""
+import logging
+import time
+from datetime import datetime
+
+import jobs
+import metrics
+import stats
+from db import client
+from auth import create_admin_if_not_exists
+from documents import ensure_default_categories
+from indexes import ensure_indexes
+
+log = logging.getLogger(__name__)
+
+
+def run_bootstrap():
+    timings = {}
+
+    def step(name, fn):
+        t0 = time.perf_counter()
+        result = fn()
+        timings[name] = (time.perf_counter() - t0) * 1000
+        return result
+
+    step("mongo_ping", lambda: client.admin.command("ping"))
+    index_errors = step("indexes", ensure_indexes)
+    step("default_categories", ensure_default_categories)
+    step("stats", stats.ensure_stats)
+    step("admin_user", create_admin_if_not_exists)
+    metrics.start_dumper()
+    jobs.start_embedded_worker()
+    for err in index_errors:
+        log.warning("index: %s", err)
+    log.info("bootstrap selesai: %s", ", ".join(f"{k}={v:.0f}ms" for k, v in timings.items()))
+    return {
+        "started_at": datetime.utcnow(),
+        "timings_ms": timings,
+        "total_ms": sum(timings.values()),
+        "index_errors": index_errors,
+    }
@@ -0,0 +1,133 @@
+# chunked.py
+"""
+Format file arsip ber-chunk dengan kompresi opsional per chunk.
+
+    MAGIC | chunk 0 | chunk 1 | ... | index | footer
+
+Setiap chunk berisi CHUNK_SIZE byte asli (kecuali yang terakhir), disimpan
+terkompresi zlib bila hasilnya lebih kecil, atau apa adanya (PDF hasil scan
+biasanya sudah terkompresi). Index di akhir file memungkinkan seek langsung ke
+chunk mana pun, sehingga pembacaan sebagian (HTTP Range) cukup men-decode
+chunk yang dibutuhkan. Memori yang dipakai saat tulis/baca hanya sekitar satu
+chunk, berapa pun ukuran file.
+"""
+import io
+import struct
+import zlib
+
+MAGIC = b"ARSIPCHK1\n"
+END_MAGIC = b"ARSIPEND"
+CHUNK_SIZE = 1024 * 1024
+_INDEX_ENTRY = struct.Struct("<QIIB")      # offset, stored_len, raw_len, compressed
+_FOOTER = struct.Struct("<QQII8s")         # index_offset, size, count, chunk_size, END_MAGIC
+
+
+def is_chunked(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class ChunkedWriter:
+    """Tulis data ke file biner `f` (sudah dibuka "wb") dalam format ber-chunk."""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE, compress=True, level=6):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.level = level
+        self.size = 0
+        self._buf = bytearray()
+        self._index = []
+        f.write(MAGIC)
+
+    def write(self, data):
+        self._buf += data
+        self.size += len(data)
+        while len(self._buf) >= self.chunk_size:
+            self._flush_chunk(bytes(self._buf[:self.chunk_size]))
+            del self._buf[:self.chunk_size]
+        return len(data)
+
+    def _flush_chunk(self, raw):
+        stored, compressed = raw, 0
+        if self.compress:
+            packed = zlib.compress(raw, self.level)
+            if len(packed) < len(raw):
+                stored, compressed = packed, 1
+        self._index.append((self.f.tell(), len(stored), len(raw), compressed))
+        self.f.write(stored)
+
+    def finish(self):
+        if self._buf:
+            self._flush_chunk(bytes(self._buf))
+            self._buf = bytearray()
+        index_offset = self.f.tell()
+        for entry in self._index:
+            self.f.write(_INDEX_ENTRY.pack(*entry))
+        self.f.write(_FOOTER.pack(index_offset, self.size, len(self._index), self.chunk_size, END_MAGIC))
+
+
+class ChunkedReader(io.RawIOBase):
+    """Pembaca seekable untuk file ber-chunk; hanya satu chunk ter-decode di memori."""
+
+    def __init__(self, path):
+        self._f = open(path, "rb")
+        self._f.seek(-_FOOTER.size, io.SEEK_END)
+        index_offset, self.size, count, self.chunk_size, end = _FOOTER.unpack(self._f.read(_FOOTER.size))
+        if end != END_MAGIC:
+            self._f.close()
+            raise ValueError(f"Bukan file ber-chunk yang valid: {path}")
+        self._f.seek(index_offset)
+        raw_index = self._f.read(count * _INDEX_ENTRY.size)
+        self._index = [_INDEX_ENTRY.unpack_from(raw_index, i * _INDEX_ENTRY.size) for i in range(count)]
+        self._pos = 0
+        self._cached = (None, b"")
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self.size + offset
+        self._pos = max(self._pos, 0)
+        return self._pos
+
+    def _chunk(self, i):
+        if self._cached[0] != i:
+            offset, stored_len, _raw_len, compressed = self._index[i]
+            self._f.seek(offset)
+            data = self._f.read(stored_len)
+            self._cached = (i, zlib.decompress(data) if compressed else data)
+        return self._cached[1]
+
+    def readinto(self, b):
+        if self._pos >= self.size:
+            return 0
+        i, start = divmod(self._pos, self.chunk_size)
+        data = self._chunk(i)
+        n = min(len(b), len(data) - start)
+        b[:n] = data[start:start + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+def open_chunked(path, buffer_size=CHUNK_SIZE):
+    return io.BufferedReader(ChunkedReader(path), buffer_size=buffer_size)
@@ -1,12 +1,45 @@
 import os
-from pymongo import MongoClient
+import threading
+from pymongo import MongoClient, monitoring
+from gridfs import GridFSBucket
+import metrics
 
 MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = "e_arsip"
+DB_NAME = os.getenv("MONGO_DB", "e_arsip")
 
-client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+class _QueryCounter(monitoring.CommandListener):
+    """Hitung command MongoDB per thread (= per rerun sesi Streamlit)."""
+    def __init__(self):
+        self._local = threading.local()
+
+    def started(self, event):
+        self._local.count = getattr(self._local, "count", 0) + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self._local.count = 0
+
+    def count(self):
+        return getattr(self._local, "count", 0)
+
+query_counter = _QueryCounter()
+
+# connect=False: tidak membuka koneksi saat import; koneksi pertama dibuat
+# oleh bootstrap.run_bootstrap() (sekali per proses)
+client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000, connect=False,
+                     event_listeners=[query_counter] + metrics.listeners())
 db = client[DB_NAME]
 
 users_col = db["users"]
 docs_col = db["documents"]
 categories_col = db["categories"]
+blobs_col = db["blobs"]
+sessions_col = db["sessions"]
+stats_col = db["stats"]
+jobs_col = db["jobs"]
+files_bucket = GridFSBucket(db, bucket_name="files")
@@ -1,79 +1,353 @@
 # documents.py
 from db import docs_col, categories_col
-from utils import save_uploaded_file
+from utils import TTLCache
+from storage import ingest_file, UploadRejected, release_file, release_file_later, open_file, file_exists, EXPORT_DIR, dedup_stats
+from search import extract_text_and_pages
+from thumbnails import schedule_thumbnails
+import stats
 from datetime import datetime
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
+import shutil
+import time
+import uuid
+import zipfile
+
+STATS_TTL = int(os.getenv("STATS_TTL", "60"))
+CATEGORY_TTL = int(os.getenv("CATEGORY_TTL", "300"))
+_stats_cache = TTLCache(STATS_TTL)
+_categories_cache = TTLCache(CATEGORY_TTL)
+_count_cache = TTLCache(STATS_TTL)
+EXPORT_MAX_AGE = 3600
 
 def ensure_default_categories():
     defaults = ["Keuangan", "SDM", "Administrasi", "Lainnya"]
     for c in defaults:
-        if not categories_col.find_one({"name": c}):
-            categories_col.insert_one({"name": c})
+        categories_col.update_one({"name": c}, {"$setOnInsert": {"name": c}}, upsert=True)
+    _categories_cache.clear()
 
 def list_categories():
-    return [c["name"] for c in categories_col.find()]
+    cats = _categories_cache.get_or_load(
+        "names", lambda: [c["name"] for c in categories_col.find({}, {"name": 1})])
+    return list(cats)
 
 def add_category(name):
     if categories_col.find_one({"name": name}):
         return False
-    categories_col.insert_one({"name": name})
+    try:
+        categories_col.insert_one({"name": name})
+    except DuplicateKeyError:
+        return False
+    _categories_cache.clear()
     return True
 
 def remove_category(name):
     categories_col.delete_one({"name": name})
+    _categories_cache.clear()
     return True
 
-def upload_document(title, category, description, year, uploaded_file, uploader_id):
-    path = save_uploaded_file(uploaded_file)
-    doc = {
+def _ingest(uploaded_file):
+    """
+    Simpan & validasi file upload (storage.ingest_file, raises UploadRejected).
+    Returns field file untuk dokumen: file_path, size_bytes, sha256,
+    page_count dan content_text.
+    """
+    path, info = ingest_file(uploaded_file)
+    try:
+        text, pages = extract_text_and_pages(path)
+    except Exception:
+        release_file(path)
+        raise
+    # hitungan pypdf pasti benar; hitungan mentah FileInspector (objek /Type /Page)
+    # terlalu besar untuk PDF dengan incremental update, jadi hanya cadangan
+    if pages is not None:
+        info["page_count"] = pages
+    return {"file_path": path, **info, "content_text": text}
+
+def _build_document(title, category, description, year, uploaded_file, uploader_id, filename=None):
+    return {
         "title": title,
         "category": category,
         "description": description,
         "year": int(year),
-        "file_path": path,
-        "original_filename": uploaded_file.name,
+        "original_filename": filename or uploaded_file.name,
         "uploader_id": uploader_id,
-        "uploaded_at": datetime.utcnow()
+        "uploaded_at": datetime.utcnow(),
+        **_ingest(uploaded_file),
     }
+
+def upload_document(title, category, description, year, uploaded_file, uploader_id):
+    doc = _build_document(title, category, description, year, uploaded_file, uploader_id)
     res = docs_col.insert_one(doc)
+    stats.apply_delta(stats.delta(doc))
+    _invalidate_stats()
+    schedule_thumbnails(doc["file_path"])
     return str(res.inserted_id)
 
+def _prepare_bulk_item(item, uploader_id):
+    f = item["open"]()
+    try:
+        return _build_document(item["title"], item["category"], item.get("description", ""),
+                               item["year"], f, uploader_id, filename=item["filename"])
+    finally:
+        if item.get("close", True) and hasattr(f, "close"):
+            f.close()
+
+def _insert_batch(batch, result, inc):
+    try:
+        res = docs_col.insert_many([doc for _, doc in batch], ordered=False)
+        result["inserted"].extend(str(i) for i in res.inserted_ids)
+        for _, doc in batch:
+            stats.delta(doc, into=inc)
+            schedule_thumbnails(doc["file_path"])
+    except BulkWriteError as e:
+        failed = {err["index"]: err.get("errmsg", "insert gagal") for err in e.details.get("writeErrors", [])}
+        for i, (name, doc) in enumerate(batch):
+            if i in failed:
+                release_file(doc["file_path"])
+                result["failed"].append((name, failed[i]))
+            else:
+                result["inserted"].append(str(doc["_id"]))
+                stats.delta(doc, into=inc)
+                schedule_thumbnails(doc["file_path"])
+    except Exception as e:
+        for name, doc in batch:
+            release_file(doc["file_path"])
+            result["failed"].append((name, str(e)))
+
+def bulk_upload_documents(items, uploader_id, workers=4, batch_size=100, progress=None):
+    """
+    Upload banyak dokumen sekaligus. Setiap item adalah dict dengan key
+    filename, open (callable yang mengembalikan file biner), title, category,
+    year dan opsional description. File ditulis + di-hash di thread pool,
+    metadata disimpan per batch lewat insert_many. Kegagalan satu file tidak
+    menghentikan batch.
+    progress(selesai, total) dipanggil setiap satu file selesai diproses.
+    Returns {"inserted": [id, ...], "failed": [(filename, pesan), ...]}.
+    """
+    result = {"inserted": [], "failed": []}
+    inc = {}
+    total = len(items)
+    batch = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_prepare_bulk_item, item, uploader_id): item["filename"] for item in items}
+        for fut in as_completed(futures):
+            name = futures[fut]
+            try:
+                batch.append((name, fut.result()))
+            except Exception as e:
+                result["failed"].append((name, str(e)))
+            if len(batch) >= batch_size:
+                _insert_batch(batch, result, inc)
+                batch = []
+            done += 1
+            if progress:
+                progress(done, total)
+    if batch:
+        _insert_batch(batch, result, inc)
+    if result["inserted"]:
+        stats.apply_delta(inc)
+        _invalidate_stats()
+    return result
+
 def list_documents(filters=None):
     q = filters or {}
     # if querying by uploader_id string, caller should convert
-    docs = list(docs_col.find(q).sort("uploaded_at", -1))
+    docs = list(docs_col.find(q, {"content_text": 0}).sort("uploaded_at", -1))
     return docs
 
+# field yang dibutuhkan halaman daftar dokumen
+LIST_FIELDS = ["title", "category", "description", "year", "file_path",
+               "original_filename", "uploader_id", "uploaded_at", "size_bytes"]
+
+def list_documents_page(filters=None, page_size=20, cursor=None, fields=None):
+    """
+    Ambil satu halaman dokumen (urut uploaded_at terbaru) dengan keyset paging.
+    cursor adalah tuple (uploaded_at, _id) dokumen terakhir halaman sebelumnya.
+    Returns (docs, next_cursor); next_cursor None jika sudah halaman terakhir.
+    """
+    q = dict(filters or {})
+    if cursor is not None:
+        last_at, last_id = cursor
+        q = {"$and": [q, {"$or": [
+            {"uploaded_at": {"$lt": last_at}},
+            {"uploaded_at": last_at, "_id": {"$lt": last_id}},
+        ]}]}
+    projection = {f: 1 for f in (fields or LIST_FIELDS)}
+    projection["uploaded_at"] = 1
+    docs = list(docs_col.find(q, projection)
+                .sort([("uploaded_at", -1), ("_id", -1)])
+                .limit(page_size + 1))
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = (docs[-1]["uploaded_at"], docs[-1]["_id"])
+    return docs, next_cursor
+
+def count_documents(filters=None):
+    """
+    Jumlah dokumen untuk filter. Tanpa filter memakai metadata koleksi
+    (estimated_document_count, O(1)); dengan filter di-cache STATS_TTL detik.
+    """
+    if not filters:
+        return docs_col.estimated_document_count()
+    key = tuple(sorted((k, str(v)) for k, v in filters.items()))
+    return _count_cache.get_or_load(key, lambda: docs_col.count_documents(filters))
+
 def get_document(doc_id):
-    return docs_col.find_one({"_id": ObjectId(doc_id)})
+    return docs_col.find_one({"_id": ObjectId(doc_id)}, {"content_text": 0})
+
+# field yang menentukan counter statistik
+STAT_FIELDS = {"category": 1, "year": 1, "uploaded_at": 1, "uploader_id": 1, "size_bytes": 1}
 
 def update_metadata(doc_id, data):
-    docs_col.update_one({"_id": ObjectId(doc_id)}, {"$set": data})
+    old = docs_col.find_one_and_update({"_id": ObjectId(doc_id)}, {"$set": data},
+                                       projection=STAT_FIELDS, return_document=ReturnDocument.BEFORE)
+    if old is None:
+        return False
+    if any(k in data for k in STAT_FIELDS):
+        inc = stats.delta(old, -1)
+        stats.apply_delta(stats.delta({**old, **data}, 1, into=inc))
+        _invalidate_stats()
+    return True
 
 def replace_file(doc_id, uploaded_file):
     doc = get_document(doc_id)
     if not doc:
         return False, "Dokumen tidak ditemukan"
-    # hapus file lama jika ada
-    old_path = doc.get("file_path")
-    if old_path and os.path.exists(old_path):
-        os.remove(old_path)
-    new_path = save_uploaded_file(uploaded_file)
-    docs_col.update_one({"_id": ObjectId(doc_id)}, {"$set": {
-        "file_path": new_path,
-        "original_filename": uploaded_file.name,
-        "uploaded_at": datetime.utcnow()
-    }})
+    # file baru disimpan & divalidasi dulu; gagal di sini tidak menyentuh file lama
+    try:
+        update = {
+            **_ingest(uploaded_file),
+            "original_filename": uploaded_file.name,
+            "uploaded_at": datetime.utcnow(),
+        }
+    except UploadRejected as e:
+        return False, str(e)
+    new_path = update["file_path"]
+    if not docs_col.update_one({"_id": ObjectId(doc_id)}, {"$set": update}).matched_count:
+        release_file(new_path)
+        return False, "Dokumen tidak ditemukan"
+    schedule_thumbnails(new_path)
+    # file lama dihapus job file_delete setelah dokumen menunjuk file baru
+    release_file_later(doc.get("file_path"))
+    inc = stats.delta(doc, -1)
+    stats.apply_delta(stats.delta({**doc, **update}, 1, into=inc))
+    _invalidate_stats()
     return True, "File diganti"
 
 def delete_document(doc_id):
     doc = get_document(doc_id)
     if not doc:
         return False
-    # hapus file fisik
-    path = doc.get("file_path")
-    if path and os.path.exists(path):
-        os.remove(path)
-    docs_col.delete_one({"_id": ObjectId(doc_id)})
+    if docs_col.delete_one({"_id": ObjectId(doc_id)}).deleted_count:
+        stats.apply_delta(stats.delta(doc, -1))
+        _invalidate_stats()
+        # file fisik dihapus belakangan oleh job file_delete (jobs.py)
+        release_file_later(doc.get("file_path"))
     return True
+
+# ---------------------------
+# Operasi massal
+# ---------------------------
+def _selection(doc_ids, owner_id=None):
+    q = {"_id": {"$in": [ObjectId(i) for i in doc_ids]}}
+    if owner_id is not None:
+        q["uploader_id"] = owner_id
+    return q
+
+def bulk_delete_documents(doc_ids, owner_id=None):
+    """
+    Hapus banyak dokumen dengan satu delete_many. File dihapus oleh satu job
+    file_delete. owner_id membatasi ke dokumen milik user tersebut.
+    Returns jumlah dokumen yang dihapus.
+    """
+    q = _selection(doc_ids, owner_id)
+    docs = list(docs_col.find(q, {**STAT_FIELDS, "file_path": 1}))
+    if not docs:
+        return 0
+    res = docs_col.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+    inc = {}
+    for d in docs:
+        stats.delta(d, -1, into=inc)
+    stats.apply_delta(inc)
+    _invalidate_stats()
+    release_file_later([d.get("file_path") for d in docs])
+    return res.deleted_count
+
+def bulk_update_metadata(doc_ids, data, owner_id=None):
+    """Ubah metadata (mis. kategori/tahun) banyak dokumen dengan satu update_many."""
+    q = _selection(doc_ids, owner_id)
+    old = list(docs_col.find(q, STAT_FIELDS)) if any(k in data for k in STAT_FIELDS) else []
+    res = docs_col.update_many(q, {"$set": data})
+    if old:
+        inc = {}
+        for d in old:
+            stats.delta(d, -1, into=inc)
+            stats.delta({**d, **data}, 1, into=inc)
+        stats.apply_delta(inc)
+        _invalidate_stats()
+    return res.modified_count
+
+def cleanup_exports():
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - EXPORT_MAX_AGE
+    for e in os.scandir(EXPORT_DIR):
+        if e.is_file() and e.stat().st_mtime < cutoff:
+            os.remove(e.path)
+
+def export_documents_zip(doc_ids, owner_id=None):
+    """
+    Tulis file dokumen terpilih ke ZIP di EXPORT_DIR secara streaming (per
+    chunk, tanpa menampung isi file di memori). Returns path ZIP.
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cleanup_exports()
+    path = os.path.join(EXPORT_DIR, f"arsip_{datetime.utcnow():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}.zip")
+    used = set()
+    cursor = docs_col.find(_selection(doc_ids, owner_id), {"file_path": 1, "original_filename": 1, "title": 1})
+    # PDF sudah terkompresi, jadi ZIP_STORED
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for d in cursor:
+            src = d.get("file_path")
+            if not file_exists(src):
+                continue
+            name = d.get("original_filename") or f"{d['_id']}.pdf"
+            if name in used:
+                name = f"{d['_id']}_{name}"
+            used.add(name)
+            with open_file(src) as f, zf.open(name, "w", force_zip64=True) as out:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+    return path
+
+# ---------------------------
+# Statistik Dashboard
+# ---------------------------
+def _invalidate_stats():
+    _stats_cache.clear()
+    _count_cache.clear()
+
+def get_dashboard_stats():
+    """
+    Total dokumen/byte dan jumlah per kategori, tahun dan bulan upload dari
+    counter koleksi `stats` (lihat stats.py). Di-cache selama STATS_TTL detik.
+    """
+    def load():
+        s = stats.read_stats()
+        return {
+            "total": s["total"],
+            "bytes": s["bytes"],
+            "per_category": {k: v["n"] for k, v in s["category"].items()},
+            "per_year": {k: v["n"] for k, v in sorted(s["year"].items())},
+            "per_month": {k: v["n"] for k, v in sorted(s["month"].items())},
+        }
+    return _stats_cache.get_or_load("dashboard", load)
+
+def get_dedup_stats():
+    """storage.dedup_stats (agregasi seluruh koleksi blobs), di-cache selama STATS_TTL detik."""
+    return _stats_cache.get_or_load("dedup", dedup_stats)
@@ -0,0 +1,219 @@
+# file_server.py
+"""
+Server file pendamping app.py untuk download & preview dokumen.
+
+File di STORAGE_DIR (atau GridFS) dilayani secara streaming (per chunk) dengan dukungan
+Range, ETag dan Cache-Control, lewat URL bertanda tangan (HMAC) yang berlaku
+singkat dan terikat ke sesi login (id sesi di sessions.py): setelah logout,
+sesi dicabut atau user dinonaktifkan, URL yang sudah dibagikan ditolak. Aktif jika FILE_SERVER_URL diset
+(secrets/env), misalnya http://localhost:8502.
+
+Tanpa file server, app.py memuat file utuh ke memori untuk download (bytes)
+dan preview (data URI base64), jadi memori puncak sebanding ukuran file.
+File di atas INLINE_MAX_BYTES (utils.py, default 25 MB) karena itu hanya
+bisa dibuka lewat file server. Untuk memori yang benar-benar terbatas,
+aktifkan FILE_SERVER_URL.
+
+Jalankan terpisah:  python file_server.py
+atau otomatis dari app.py (thread daemon di proses Streamlit).
+"""
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlencode, urlparse, parse_qs
+
+from utils import STORAGE_DIR, get_secret
+from storage import GRIDFS_PREFIX, file_etag, file_exists, file_size, iter_file
+from sessions import session_active
+
+FILE_SERVER_URL = (get_secret("FILE_SERVER_URL") or "").rstrip("/")
+FILE_SERVER_HOST = get_secret("FILE_SERVER_HOST", "0.0.0.0")
+FILE_SERVER_PORT = int(get_secret("FILE_SERVER_PORT", 8502))
+# tanpa secret bersama, pakai secret acak per proses (cukup jika server
+# berjalan di proses yang sama dengan Streamlit)
+FILE_SERVER_SECRET = (get_secret("FILE_SERVER_SECRET") or secrets.token_hex(32)).encode()
+URL_TTL = int(get_secret("FILE_SERVER_URL_TTL", 300))
+# FILE_SERVER_EXTERNAL: server dijalankan terpisah, app.py tidak memulai thread sendiri
+EMBEDDED = not get_secret("FILE_SERVER_EXTERNAL")
+CHUNK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+_server = None
+_server_lock = threading.Lock()
+
+
+def enabled():
+    return bool(FILE_SERVER_URL)
+
+
+def _signature(rel, exp, sid, dl):
+    msg = f"{rel}|{exp}|{sid}|{dl}".encode()
+    return hmac.new(FILE_SERVER_SECRET, msg, hashlib.sha256).hexdigest()
+
+
+def signed_url(file_path, session_id, download_name="", ttl=URL_TTL):
+    """
+    Buat URL bertanda tangan untuk file arsip (path di STORAGE_DIR atau gridfs://).
+    session_id adalah sessions.session_id(token) sesi yang sedang login.
+    download_name kosong = tampil inline (preview), selain itu sebagai attachment.
+    """
+    if file_path.startswith(GRIDFS_PREFIX):
+        rel = "gridfs/" + file_path[len(GRIDFS_PREFIX):]
+    else:
+        rel = os.path.relpath(os.path.abspath(file_path), os.path.abspath(STORAGE_DIR)).replace(os.sep, "/")
+    # kadaluarsa dibulatkan ke jendela ttl agar URL stabil antar rerun
+    # (iframe tidak dimuat ulang dan cache browser tetap terpakai)
+    exp = (int(time.time()) // ttl + 2) * ttl
+    sid = str(session_id)
+    params = {"exp": exp, "sid": sid, "sig": _signature(rel, exp, sid, download_name)}
+    if download_name:
+        params["dl"] = download_name
+    return f"{FILE_SERVER_URL}/files/{quote(rel)}?{urlencode(params)}"
+
+
+def _resolve(rel):
+    """rel dari URL -> referensi file storage (None jika di luar STORAGE_DIR)."""
+    if rel.startswith("gridfs/"):
+        return GRIDFS_PREFIX + rel[len("gridfs/"):]
+    root = os.path.realpath(STORAGE_DIR)
+    path = os.path.realpath(os.path.join(root, rel))
+    if not path.startswith(root + os.sep):
+        return None
+    return path
+
+
+def _parse_range(header, size):
+    m = _RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+    else:
+        # suffix range: N byte terakhir
+        start = max(size - int(m.group(2)), 0)
+        end = size - 1
+    end = min(end, size - 1)
+    if start > end:
+        return None
+    return start, end
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _error(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _serve(self, send_body):
+        url = urlparse(self.path)
+        if not url.path.startswith("/files/"):
+            return self._error(404)
+        rel = unquote(url.path[len("/files/"):])
+        qs = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            exp = int(qs.get("exp", "0"))
+        except ValueError:
+            return self._error(403)
+        dl = qs.get("dl", "")
+        sid = qs.get("sid", "")
+        expected = _signature(rel, exp, sid, dl)
+        if exp < time.time() or not hmac.compare_digest(expected, qs.get("sig", "")):
+            return self._error(403)
+        try:
+            if not session_active(sid):
+                return self._error(403)
+        except Exception:
+            return self._error(503)
+
+        path = _resolve(rel)
+        try:
+            if not path or not file_exists(path):
+                return self._error(404)
+            size = file_size(path)
+            etag = f'"{file_etag(path)}"'
+        except Exception:
+            return self._error(404)
+        max_age = max(exp - int(time.time()), 0)
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", f"private, max-age={max_age}")
+            self.end_headers()
+            return
+
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range", etag) == etag and size > 0:
+            rng = _parse_range(range_header, size)
+            if rng is None:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            start, end = rng
+            status = 206
+        length = max(end - start + 1, 0)
+
+        self.send_response(status)
+        self.send_header("Content-Type", mimetypes.guess_type(dl or path)[0] or "application/pdf")
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", f"private, max-age={max_age}")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        disposition = "attachment" if dl else "inline"
+        self.send_header("Content-Disposition", f"{disposition}; filename*=UTF-8''{quote(dl or os.path.basename(path))}")
+        self.end_headers()
+        if not send_body:
+            return
+
+        if length == 0:
+            return
+        # format ber-chunk: hanya chunk yang masuk range yang di-decode
+        for chunk in iter_file(path, start, end, CHUNK_SIZE):
+            try:
+                self.wfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+
+def start_file_server():
+    """Jalankan server di thread daemon (sekali per proses). Returns server."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((FILE_SERVER_HOST, FILE_SERVER_PORT), FileHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="file-server", daemon=True).start()
+        return _server
+
+
+if __name__ == "__main__":
+    if not get_secret("FILE_SERVER_SECRET"):
+        raise SystemExit("FILE_SERVER_SECRET wajib diset (sama dengan app.py) untuk server terpisah.")
+    print(f"File server di {FILE_SERVER_HOST}:{FILE_SERVER_PORT}, root={os.path.abspath(STORAGE_DIR)}")
+    server = ThreadingHTTPServer((FILE_SERVER_HOST, FILE_SERVER_PORT), FileHandler)
+    server.daemon_threads = True
+    server.serve_forever()
@@ -0,0 +1,119 @@
+# indexes.py
+"""
+Deklarasi index koleksi e_arsip dan pemeriksaan query plan.
+
+ensure_indexes() idempoten (create_index dengan nama tetap) dan dijalankan
+saat startup. check_query_plans() menjalankan explain() untuk setiap bentuk
+query yang dipakai documents.py / auth.py / storage.py dan melaporkan yang
+tidak didukung index (COLLSCAN).
+
+CLI:
+    python indexes.py ensure
+    python indexes.py check
+"""
+import sys
+from datetime import datetime
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from db import users_col, docs_col, categories_col, blobs_col, sessions_col, jobs_col
+from search import ensure_search_index
+
+_NEWEST = [("uploaded_at", DESCENDING), ("_id", DESCENDING)]
+
+INDEXES = [
+    (users_col, [("email", ASCENDING)], {"name": "users_email_unique", "unique": True}),
+    (categories_col, [("name", ASCENDING)], {"name": "categories_name_unique", "unique": True}),
+    (docs_col, _NEWEST, {"name": "documents_newest"}),
+    (docs_col, [("uploader_id", ASCENDING)] + _NEWEST, {"name": "documents_uploader_newest"}),
+    (docs_col, [("category", ASCENDING)] + _NEWEST, {"name": "documents_category_newest"}),
+    (docs_col, [("year", ASCENDING)] + _NEWEST, {"name": "documents_year_newest"}),
+    (docs_col, [("category", ASCENDING), ("year", ASCENDING)] + _NEWEST,
+     {"name": "documents_category_year_newest"}),
+    (docs_col, [("file_path", ASCENDING)], {"name": "documents_file_path"}),
+    (blobs_col, [("path", ASCENDING)], {"name": "blobs_path"}),
+    (sessions_col, [("expires_at", ASCENDING)], {"name": "sessions_ttl", "expireAfterSeconds": 0}),
+    (sessions_col, [("user_id", ASCENDING)], {"name": "sessions_user"}),
+    (jobs_col, [("state", ASCENDING), ("run_after", ASCENDING)], {"name": "jobs_claim"}),
+    (jobs_col, [("key", ASCENDING), ("state", ASCENDING)], {"name": "jobs_key"}),
+    # job selesai/gagal dibuang otomatis setelah 30 hari
+    (jobs_col, [("finished_at", ASCENDING)], {"name": "jobs_finished_ttl", "expireAfterSeconds": 30 * 86400}),
+]
+
+
+def ensure_indexes():
+    """Buat semua index. Returns daftar error (mis. data duplikat untuk index unik)."""
+    errors = []
+    for col, keys, opts in INDEXES:
+        try:
+            col.create_index(keys, **opts)
+        except OperationFailure as e:
+            errors.append(f"{col.name}.{opts['name']}: {e}")
+    try:
+        ensure_search_index()
+    except OperationFailure as e:
+        errors.append(f"documents.text: {e}")
+    return errors
+
+
+def _query_shapes():
+    oid = ObjectId()
+    now = datetime.utcnow()
+    return [
+        ("auth.login_user", users_col, {"email": "x@y", "active": True}, None),
+        ("auth.register_user", users_col, {"email": "x@y"}, None),
+        ("documents.add_category", categories_col, {"name": "Lainnya"}, None),
+        ("documents.get_document", docs_col, {"_id": oid}, None),
+        ("documents.list_documents_page", docs_col, {}, _NEWEST),
+        ("documents.list_documents_page (cursor)", docs_col,
+         {"$or": [{"uploaded_at": {"$lt": now}}, {"uploaded_at": now, "_id": {"$lt": oid}}]}, _NEWEST),
+        ("documents.list_documents_page (uploader)", docs_col, {"uploader_id": oid}, _NEWEST),
+        ("documents.list_documents_page (category)", docs_col, {"category": "Lainnya"}, _NEWEST),
+        ("documents.list_documents_page (year)", docs_col, {"year": 2024}, _NEWEST),
+        ("documents.list_documents_page (category+year)", docs_col,
+         {"category": "Lainnya", "year": 2024}, _NEWEST),
+        ("search.search_documents", docs_col, {"$text": {"$search": "arsip"}}, None),
+        ("storage.release", blobs_col, {"path": "storage/cas/x"}, None),
+        ("sessions.invalidate_user_sessions", sessions_col, {"user_id": oid}, None),
+        ("jobs.claim", jobs_col, {"state": "queued", "run_after": {"$lte": now}}, [("run_after", ASCENDING)]),
+        ("storage.purge_file", docs_col, {"file_path": "storage/cas/x"}, None),
+    ]
+
+
+def _stages(plan):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+def check_query_plans():
+    """Returns list of (nama, ok, stages) untuk setiap bentuk query."""
+    report = []
+    for name, col, q, sort in _query_shapes():
+        cursor = col.find(q)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        stages = [s for s in _stages(plan) if s]
+        report.append((name, "COLLSCAN" not in stages and "SORT" not in stages, stages))
+    return report
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "ensure":
+        errors = ensure_indexes()
+        print("\n".join(errors) or "Semua index OK")
+    elif cmd == "check":
+        bad = 0
+        for name, ok, stages in check_query_plans():
+            bad += not ok
+            print(f"{'OK ' if ok else 'BAD'} {name}: {' <- '.join(stages)}")
+        sys.exit(1 if bad else 0)
+    else:
+        print(__doc__)
@@ -0,0 +1,151 @@
+# ingest.py
+"""
+Bulk ingest dokumen dari folder atau file ZIP.
+
+    python ingest.py <folder|arsip.zip> --uploader admin@kpu.go.id \
+        [--manifest manifest.csv|manifest.json] [--category Lainnya] [--year 2024] \
+        [--workers 8] [--batch 200]
+
+Manifest (CSV dengan header, atau JSON list of objects) berisi kolom
+file, title, category, description, year. Path `file` relatif terhadap
+folder/ZIP. Tanpa manifest semua *.pdf diambil dengan judul = nama file,
+kategori/tahun dari argumen. Baris manifest yang tidak valid (tanpa `file`,
+file tidak ada, tahun bukan angka) dilaporkan sebagai gagal; baris lain
+tetap diproses.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import zipfile
+from datetime import datetime
+
+from db import users_col
+from documents import bulk_upload_documents
+
+
+def _read_manifest(path, source):
+    if path:
+        with open(path, "rb") as f:
+            raw = f.read()
+    elif source.exists("manifest.csv"):
+        path, raw = "manifest.csv", source.read("manifest.csv")
+    elif source.exists("manifest.json"):
+        path, raw = "manifest.json", source.read("manifest.json")
+    else:
+        return None
+    text = raw.decode("utf-8-sig")
+    if path.lower().endswith(".json"):
+        return json.loads(text)
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+class _DirSource:
+    def __init__(self, root):
+        self.root = root
+
+    def names(self):
+        for dirpath, _dirs, files in os.walk(self.root):
+            for name in files:
+                yield os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/")
+
+    def exists(self, name):
+        return os.path.isfile(os.path.join(self.root, name))
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), "rb") as f:
+            return f.read()
+
+    def opener(self, name):
+        return lambda: open(os.path.join(self.root, name), "rb")
+
+
+class _ZipSource:
+    def __init__(self, path):
+        self.zf = zipfile.ZipFile(path)
+
+    def names(self):
+        return (i.filename for i in self.zf.infolist() if not i.is_dir())
+
+    def exists(self, name):
+        return name in self.zf.NameToInfo
+
+    def read(self, name):
+        return self.zf.read(name)
+
+    def opener(self, name):
+        return lambda: self.zf.open(name)
+
+
+def _row_item(source, row, default_category, default_year):
+    """Item upload dari satu baris manifest; ValueError jika baris tidak valid."""
+    if not isinstance(row, dict):
+        raise ValueError("baris manifest bukan object")
+    name = row.get("file")
+    if not name or not isinstance(name, str):
+        raise ValueError("kolom 'file' kosong")
+    if not source.exists(name):
+        raise ValueError("file tidak ditemukan")
+    year = row.get("year") or default_year
+    try:
+        year = int(str(year).strip())
+    except ValueError:
+        raise ValueError(f"tahun tidak valid: {year!r}") from None
+    return {
+        "filename": os.path.basename(name),
+        "open": source.opener(name),
+        "title": (row.get("title") or os.path.splitext(os.path.basename(name))[0]).strip(),
+        "category": row.get("category") or default_category,
+        "description": row.get("description") or "",
+        "year": year,
+    }
+
+
+def build_items(source, manifest, default_category, default_year):
+    """Returns (items, failed) dengan failed = [(nama/baris, pesan), ...]."""
+    if manifest is None:
+        manifest = [{"file": n} for n in sorted(source.names()) if n.lower().endswith(".pdf")]
+    items, failed = [], []
+    for lineno, row in enumerate(manifest, 1):
+        try:
+            items.append(_row_item(source, row, default_category, default_year))
+        except ValueError as e:
+            name = row.get("file") if isinstance(row, dict) else None
+            failed.append((name or f"baris {lineno}", str(e)))
+    return items, failed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bulk ingest dokumen arsip")
+    ap.add_argument("source", help="folder atau file .zip")
+    ap.add_argument("--uploader", required=True, help="email user pengupload")
+    ap.add_argument("--manifest")
+    ap.add_argument("--category", default="Lainnya")
+    ap.add_argument("--year", type=int, default=datetime.utcnow().year)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--batch", type=int, default=200)
+    args = ap.parse_args()
+
+    user = users_col.find_one({"email": args.uploader}, {"_id": 1})
+    if not user:
+        sys.exit(f"User {args.uploader} tidak ditemukan")
+    source = _ZipSource(args.source) if args.source.lower().endswith(".zip") else _DirSource(args.source)
+    items, invalid = build_items(source, _read_manifest(args.manifest, source), args.category, args.year)
+
+    def progress(done, total):
+        print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+    result = bulk_upload_documents(items, user["_id"], workers=args.workers,
+                                   batch_size=args.batch, progress=progress)
+    result["failed"][:0] = invalid
+    print(file=sys.stderr)
+    print(f"Berhasil: {len(result['inserted'])}, gagal: {len(result['failed'])}")
+    for name, err in result["failed"]:
+        print(f"  GAGAL {name}: {err}")
+    sys.exit(1 if result["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
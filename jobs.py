@@ -0,0 +1,517 @@
+# jobs.py
+"""
+Antrian job pemeliharaan berbasis MongoDB (koleksi `jobs`).
+
+Job diambil worker dengan find_one_and_update (state queued -> running) dan
+memegang lease selama JOB_LEASE detik yang diperpanjang setiap checkpoint dan,
+di tengah batch yang lama (file besar), paling lambat tiap JOB_LEASE/3 detik.
+Worker yang mati meninggalkan job `running` dengan heartbeat kedaluwarsa;
+job itu diambil ulang worker lain dan dilanjutkan dari checkpoint terakhir.
+Semua handler bekerja per batch (JOB_BATCH_SIZE) dengan jeda antar batch dan
+batas laju baca file (JOB_IO_MBPS), sehingga sapuan jutaan file bisa berjalan
+di jam kerja tanpa lonjakan I/O.
+
+Jenis job:
+- file_delete      : hapus fisik file yang dilepas dokumen (lihat storage.release_file_later)
+- orphan_scan      : file di storage tanpa dokumen, dan dokumen yang filenya hilang
+- verify_checksums : hitung ulang sha256 blob CAS, file GridFS dan file lokal
+- retention_purge  : hapus dokumen dengan tahun < before_year
+
+CLI:
+    python jobs.py worker [--processes N] [--types a,b]
+    python jobs.py enqueue orphan_scan [--delete]
+    python jobs.py enqueue verify_checksums
+    python jobs.py enqueue retention_purge --before-year 2015 [--category X] [--dry-run]
+    python jobs.py list
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, ReturnDocument
+
+from db import jobs_col
+from utils import get_secret
+
+log = logging.getLogger(__name__)
+
+JOB_LEASE = int(get_secret("JOB_LEASE", 300))
+JOB_MAX_ATTEMPTS = int(get_secret("JOB_MAX_ATTEMPTS", 5))
+JOB_POLL_INTERVAL = float(get_secret("JOB_POLL_INTERVAL", 5))
+JOB_BATCH_SIZE = int(get_secret("JOB_BATCH_SIZE", 500))
+JOB_BATCH_PAUSE = float(get_secret("JOB_BATCH_PAUSE", 0.2))
+JOB_IO_MBPS = float(get_secret("JOB_IO_MBPS", 20))
+# jeda sebelum file yang dilepas benar-benar dihapus (unduhan yang sedang berjalan)
+DELETE_DELAY = int(get_secret("DELETE_DELAY", 300))
+# worker thread di proses app; job berat sebaiknya di `python jobs.py worker`
+JOBS_EMBEDDED = str(get_secret("JOBS_EMBEDDED", "1")).lower() not in ("0", "false", "no")
+JOBS_EMBEDDED_TYPES = [t for t in str(get_secret("JOBS_EMBEDDED_TYPES", "file_delete")).split(",") if t]
+RESULT_SAMPLE = 100
+
+
+class JobLost(Exception):
+    """Lease job diambil worker lain (mis. karena heartbeat terlambat)."""
+
+
+def enqueue(job_type, params=None, delay=0, key=None):
+    """
+    Masukkan job ke antrian. Jika key diberikan dan sudah ada job dengan key
+    yang sama yang masih queued/running, job itu yang dikembalikan.
+    Returns _id job.
+    """
+    if job_type not in HANDLERS:
+        raise ValueError(f"Jenis job tidak dikenal: {job_type}")
+    if key:
+        existing = jobs_col.find_one({"key": key, "state": {"$in": ["queued", "running"]}}, {"_id": 1})
+        if existing:
+            return existing["_id"]
+    now = datetime.utcnow()
+    return jobs_col.insert_one({
+        "type": job_type,
+        "params": params or {},
+        "key": key,
+        "state": "queued",
+        "created_at": now,
+        "run_after": now + timedelta(seconds=delay),
+        "attempts": 0,
+        "checkpoint": {},
+        "progress": {},
+    }).inserted_id
+
+
+def claim(worker_id, types=None):
+    """Ambil satu job yang siap (atau yang lease-nya kedaluwarsa). Returns dokumen job atau None."""
+    now = datetime.utcnow()
+    q = {"$or": [
+        {"state": "queued", "run_after": {"$lte": now}},
+        {"state": "running", "heartbeat_at": {"$lt": now - timedelta(seconds=JOB_LEASE)}},
+    ]}
+    if types:
+        q["type"] = {"$in": list(types)}
+    return jobs_col.find_one_and_update(
+        q,
+        {"$set": {"state": "running", "worker": worker_id, "heartbeat_at": now},
+         "$inc": {"attempts": 1},
+         "$min": {"started_at": now}},
+        sort=[("run_after", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def list_jobs(limit=50):
+    return list(jobs_col.find({}, {"params.paths": 0}).sort("created_at", -1).limit(limit))
+
+
+class _Throttle:
+    """Batasi laju baca (byte/detik) dengan tidur seperlunya."""
+
+    def __init__(self, mbps):
+        self.rate = mbps * 1024 * 1024
+        self.started = time.monotonic()
+        self.consumed = 0
+
+    def consume(self, n):
+        if self.rate <= 0:
+            return
+        self.consumed += n
+        ahead = self.consumed / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class JobContext:
+    """State eksekusi satu job: checkpoint, progress, throttle."""
+
+    def __init__(self, job, worker_id):
+        self.job_id = job["_id"]
+        self.worker_id = worker_id
+        self.params = job.get("params") or {}
+        self.checkpoint = dict(job.get("checkpoint") or {})
+        self.progress = dict(job.get("progress") or {})
+        self.throttle = _Throttle(JOB_IO_MBPS)
+        self._beat = time.monotonic()
+
+    def _mine(self):
+        return {"_id": self.job_id, "worker": self.worker_id, "state": "running"}
+
+    def heartbeat(self):
+        """Perpanjang lease di tengah batch; murah dipanggil per file/chunk."""
+        if time.monotonic() - self._beat < JOB_LEASE / 3:
+            return
+        res = jobs_col.update_one(self._mine(), {"$set": {"heartbeat_at": datetime.utcnow()}})
+        if not res.matched_count:
+            raise JobLost(str(self.job_id))
+        self._beat = time.monotonic()
+
+    def count(self, name, n=1):
+        self.progress[name] = self.progress.get(name, 0) + n
+
+    def sample(self, name, value):
+        """Simpan contoh temuan (maks RESULT_SAMPLE per jenis) ke job."""
+        items = self.progress.setdefault(f"{name}_sample", [])
+        if len(items) < RESULT_SAMPLE:
+            items.append(value)
+
+    def save(self, **checkpoint):
+        """Simpan checkpoint & progress dan perpanjang lease; dipanggil per batch."""
+        self.checkpoint.update(checkpoint)
+        res = jobs_col.update_one(
+            self._mine(),
+            {"$set": {"checkpoint": self.checkpoint, "progress": self.progress,
+                      "heartbeat_at": datetime.utcnow()}})
+        if not res.matched_count:
+            raise JobLost(str(self.job_id))
+        self._beat = time.monotonic()
+        if JOB_BATCH_PAUSE:
+            time.sleep(JOB_BATCH_PAUSE)
+
+
+def run_job(job, worker_id):
+    """Jalankan satu job yang sudah di-claim sampai selesai, gagal atau diulang nanti."""
+    ctx = JobContext(job, worker_id)
+    mine = {"_id": job["_id"], "worker": worker_id, "state": "running"}
+    try:
+        HANDLERS[job["type"]](ctx)
+    except JobLost:
+        log.warning("job %s diambil alih worker lain", job["_id"])
+        return
+    except Exception as e:
+        log.exception("job %s (%s) gagal", job["_id"], job["type"])
+        retry = job.get("attempts", 1) < JOB_MAX_ATTEMPTS
+        update = {"checkpoint": ctx.checkpoint, "progress": ctx.progress, "error": str(e)}
+        if retry:
+            # lanjut dari checkpoint setelah jeda yang makin panjang
+            update.update(state="queued", run_after=datetime.utcnow() + timedelta(
+                seconds=min(60 * 2 ** job.get("attempts", 1), 3600)))
+        else:
+            update.update(state="failed", finished_at=datetime.utcnow())
+        jobs_col.update_one(mine, {"$set": update})
+        return
+    jobs_col.update_one(mine, {"$set": {
+        "state": "done", "checkpoint": ctx.checkpoint, "progress": ctx.progress,
+        "error": None, "finished_at": datetime.utcnow()}})
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _idle(stop, seconds):
+    if stop:
+        stop.wait(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def work(types=None, stop=None, once=False):
+    """
+    Loop worker: claim & jalankan job sampai stop di-set (atau antrian kosong
+    jika once). Error MongoDB sementara (failover, server selection timeout)
+    dicatat lalu dicoba lagi dengan jeda yang makin panjang, tidak mematikan loop.
+    """
+    worker_id = _worker_id()
+    errors = 0
+    while not (stop and stop.is_set()):
+        try:
+            job = claim(worker_id, types)
+            if job is None:
+                errors = 0
+                if once:
+                    return
+                _idle(stop, JOB_POLL_INTERVAL)
+                continue
+            run_job(job, worker_id)
+            errors = 0
+        except Exception:
+            errors += 1
+            log.exception("worker %s: gagal mengakses antrian job (ke-%d)", worker_id, errors)
+            if once and errors >= JOB_MAX_ATTEMPTS:
+                raise
+            _idle(stop, min(JOB_POLL_INTERVAL * 2 ** errors, 300))
+
+
+def _process_main(types):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    try:
+        work(types)
+    except KeyboardInterrupt:
+        # job yang sedang jalan dilanjutkan worker lain setelah lease habis
+        pass
+
+
+def run_workers(processes=2, types=None):
+    """Jalankan `processes` worker di process pool (spawn: aman untuk MongoClient)."""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx) as pool:
+        futures = [pool.submit(_process_main, types) for _ in range(processes)]
+        for f in futures:
+            f.result()
+
+
+_embedded = None
+_embedded_lock = threading.Lock()
+
+
+def start_embedded_worker():
+    """Worker thread di proses app untuk job ringan (JOBS_EMBEDDED_TYPES). Idempoten."""
+    global _embedded
+    if not JOBS_EMBEDDED:
+        return None
+    with _embedded_lock:
+        if _embedded is None:
+            _embedded = threading.Thread(target=work, args=(JOBS_EMBEDDED_TYPES, threading.Event()),
+                                         name="jobs-embedded", daemon=True)
+            _embedded.start()
+    return _embedded
+
+
+# ---------------------------
+# Handler
+# ---------------------------
+def _file_delete(ctx):
+    from storage import purge_file
+
+    paths = ctx.params.get("paths", [])
+    start = ctx.checkpoint.get("next", 0)
+    for i in range(start, len(paths), JOB_BATCH_SIZE):
+        for path in paths[i:i + JOB_BATCH_SIZE]:
+            ctx.heartbeat()
+            ctx.count("deleted" if purge_file(path) else "kept")
+        ctx.save(next=i + JOB_BATCH_SIZE)
+
+
+def _walk_sorted(top, skip, after=""):
+    """
+    Yield path file di bawah top dalam urutan string path penuh (sama dengan
+    perbandingan checkpoint), mulai sesudah `after`. Direktori diurutkan
+    sebagai "nama/" sehingga isinya muncul tepat di posisi urutan string-nya;
+    subtree yang seluruhnya <= after dilewati tanpa dibaca.
+    """
+    try:
+        entries = list(os.scandir(top))
+    except FileNotFoundError:
+        return
+    keyed = sorted((e.path + os.sep if e.is_dir(follow_symlinks=False) else e.path, e) for e in entries)
+    for key, e in keyed:
+        if key.endswith(os.sep):
+            if os.path.abspath(e.path) in skip or (key <= after and not after.startswith(key)):
+                continue
+            yield from _walk_sorted(e.path, skip, after)
+        elif e.is_file() and e.path > after:
+            yield e.path
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _orphan_scan(ctx):
+    """
+    Fase "files": file di STORAGE_DIR tanpa documents.file_path (dihapus jika
+    params.delete dan lebih tua dari min_age). Fase "records": dokumen yang
+    filenya tidak ada ditandai file_missing.
+    """
+    from db import docs_col
+    from storage import STORAGE_DIR, TMP_DIR, THUMB_DIR, EXPORT_DIR, file_exists, purge_file
+
+    delete = ctx.params.get("delete", False)
+    min_age = ctx.params.get("min_age", 3600)
+    if ctx.checkpoint.get("phase", "files") == "files":
+        skip = {os.path.abspath(d) for d in (TMP_DIR, THUMB_DIR, EXPORT_DIR)}
+        after = ctx.checkpoint.get("after", "")
+        paths = _walk_sorted(STORAGE_DIR, skip, after)
+        for batch in _batches(paths, JOB_BATCH_SIZE):
+            known = {d["file_path"] for d in docs_col.find({"file_path": {"$in": batch}}, {"file_path": 1})}
+            now = time.time()
+            for path in batch:
+                ctx.heartbeat()
+                ctx.count("files_scanned")
+                if path in known:
+                    continue
+                try:
+                    if now - os.path.getmtime(path) < min_age:
+                        continue  # upload yang sedang berjalan
+                    size = os.path.getsize(path)
+                except FileNotFoundError:
+                    continue
+                ctx.count("orphans")
+                ctx.count("orphan_bytes", size)
+                ctx.sample("orphans", path)
+                if delete and purge_file(path):
+                    ctx.count("orphans_deleted")
+            ctx.save(after=batch[-1])
+        ctx.save(phase="records", after=None)
+
+    after = ctx.checkpoint.get("after")
+    while True:
+        q = {"_id": {"$gt": after}} if after else {}
+        batch = list(docs_col.find(q, {"file_path": 1, "file_missing": 1})
+                     .sort("_id", ASCENDING).limit(JOB_BATCH_SIZE))
+        if not batch:
+            break
+        missing, found = [], []
+        for d in batch:
+            ctx.heartbeat()
+            ctx.count("records_scanned")
+            if file_exists(d.get("file_path")):
+                if d.get("file_missing"):
+                    found.append(d["_id"])
+            else:
+                missing.append(d["_id"])
+                ctx.sample("missing", str(d["_id"]))
+        if missing:
+            docs_col.update_many({"_id": {"$in": missing}}, {"$set": {"file_missing": datetime.utcnow()}})
+            ctx.count("missing", len(missing))
+        if found:
+            docs_col.update_many({"_id": {"$in": found}}, {"$unset": {"file_missing": ""}})
+        after = batch[-1]["_id"]
+        ctx.save(after=after)
+
+
+def _sha256(ctx, path):
+    from storage import open_file
+
+    h = hashlib.sha256()
+    with open_file(path) as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            ctx.throttle.consume(len(chunk))
+            ctx.heartbeat()  # satu file bisa ratusan MB pada JOB_IO_MBPS
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _verify_checksums(ctx):
+    """
+    Hitung ulang sha256 isi file dan bandingkan dengan yang tercatat:
+    _id blob CAS, field sha256 file GridFS, atau documents.sha256 untuk file
+    lokal (dicatat pada pemeriksaan pertama jika belum ada).
+    """
+    from db import db, blobs_col, docs_col
+    from storage import CAS_DIR, GRIDFS_PREFIX, file_exists
+
+    files_col = db["files.files"]
+    not_cas_or_gridfs = {"file_path": {"$not": re.compile("^(" + re.escape(CAS_DIR) + "|"
+                                                          + re.escape(GRIDFS_PREFIX) + ")")}}
+    phases = [
+        # fase, koleksi, filter, projection, (ref, sha256 tercatat)
+        ("cas", blobs_col, {}, {"path": 1},
+         lambda d: (d["path"], d["_id"])),
+        ("gridfs", files_col, {}, {"sha256": 1},
+         lambda d: (f"{GRIDFS_PREFIX}{d['_id']}", d.get("sha256"))),
+        ("local", docs_col, not_cas_or_gridfs, {"file_path": 1, "sha256": 1},
+         lambda d: (d.get("file_path"), d.get("sha256"))),
+    ]
+    names = [p[0] for p in phases]
+    start = names.index(ctx.checkpoint.get("phase", names[0]))
+    for i, (name, col, base_q, projection, describe) in enumerate(phases[start:], start):
+        after = ctx.checkpoint.get("after")
+        while True:
+            q = dict(base_q)
+            if after is not None:
+                q["_id"] = {"$gt": after}
+            batch = list(col.find(q, projection).sort("_id", ASCENDING).limit(JOB_BATCH_SIZE))
+            if not batch:
+                break
+            for d in batch:
+                ctx.heartbeat()
+                ref, expected = describe(d)
+                if not file_exists(ref):
+                    ctx.count("missing")
+                    ctx.sample("missing", ref)
+                    continue
+                actual = _sha256(ctx, ref)
+                ctx.count("verified")
+                if expected is None:
+                    col.update_one({"_id": d["_id"]}, {"$set": {"sha256": actual}})
+                    ctx.count("recorded")
+                elif actual != expected:
+                    ctx.count("corrupt")
+                    ctx.sample("corrupt", ref)
+            after = batch[-1]["_id"]
+            ctx.save(phase=name, after=after)
+        if i + 1 < len(phases):
+            ctx.save(phase=names[i + 1], after=None)
+
+
+def _retention_purge(ctx):
+    """Hapus dokumen dengan year < before_year (opsional per kategori), per batch."""
+    from db import docs_col
+    from documents import bulk_delete_documents
+
+    before_year = int(ctx.params["before_year"])
+    q = {"year": {"$lt": before_year}}
+    if ctx.params.get("category"):
+        q["category"] = ctx.params["category"]
+    if ctx.params.get("dry_run"):
+        ctx.count("matched", docs_col.count_documents(q))
+        return
+    while True:
+        ids = [d["_id"] for d in docs_col.find(q, {"_id": 1}).sort("_id", ASCENDING).limit(JOB_BATCH_SIZE)]
+        if not ids:
+            break
+        ctx.count("deleted", bulk_delete_documents([str(i) for i in ids]))
+        # dokumen yang sudah dihapus tidak muncul lagi, jadi cukup simpan posisi terakhir
+        ctx.save(last_id=str(ids[-1]))
+
+
+HANDLERS = {
+    "file_delete": _file_delete,
+    "orphan_scan": _orphan_scan,
+    "verify_checksums": _verify_checksums,
+    "retention_purge": _retention_purge,
+}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Antrian job pemeliharaan arsip")
+    sub = ap.add_subparsers(dest="cmd")
+    w = sub.add_parser("worker")
+    w.add_argument("--processes", type=int, default=2)
+    w.add_argument("--types", default="", help="jenis job yang dikerjakan, dipisah koma (default semua)")
+    e = sub.add_parser("enqueue")
+    e.add_argument("type", choices=sorted(HANDLERS))
+    e.add_argument("--delete", action="store_true", help="orphan_scan: hapus file yatim")
+    e.add_argument("--before-year", type=int, help="retention_purge: hapus dokumen sebelum tahun ini")
+    e.add_argument("--category")
+    e.add_argument("--dry-run", action="store_true")
+    sub.add_parser("list")
+    args = ap.parse_args()
+
+    if args.cmd == "worker":
+        logging.basicConfig(level=logging.INFO)
+        run_workers(args.processes, [t for t in args.types.split(",") if t] or None)
+    elif args.cmd == "enqueue":
+        params = {}
+        if args.type == "orphan_scan":
+            params["delete"] = args.delete
+        elif args.type == "retention_purge":
+            if not args.before_year:
+                sys.exit("--before-year wajib untuk retention_purge")
+            params = {"before_year": args.before_year, "category": args.category, "dry_run": args.dry_run}
+        print(enqueue(args.type, params, key=None if args.type == "retention_purge" else args.type))
+    elif args.cmd == "list":
+        for j in list_jobs():
+            print(j["_id"], j["type"], j["state"], j.get("progress"), j.get("error") or "")
+    else:
+        ap.print_help()
@@ -0,0 +1,157 @@
+# metrics.py
+"""
+Instrumentasi ringan: timer per render/menu, counter (mis. byte baca/tulis
+storage) dan monitoring command MongoDB lewat pymongo CommandListener.
+
+Aktif jika METRICS_ENABLED=1. Saat nonaktif, timer() mengembalikan context
+manager kosong dan inc() langsung return, sehingga biayanya hampir nol.
+Snapshot bisa ditulis berkala ke METRICS_DUMP_PATH (.json atau format teks
+Prometheus untuk ekstensi lain) supaya bisa di-scrape.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from pymongo import monitoring
+
+ENABLED = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+DUMP_PATH = os.getenv("METRICS_DUMP_PATH", "")
+DUMP_INTERVAL = int(os.getenv("METRICS_DUMP_INTERVAL", "15"))
+
+_lock = threading.Lock()
+_timers = {}     # name -> [count, total_ms, max_ms, last_ms]
+_counters = {}   # name -> value
+_started_at = time.time()
+_NOOP = nullcontext()
+
+
+def observe(name, ms):
+    if not ENABLED:
+        return
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            _timers[name] = [1, ms, ms, ms]
+        else:
+            t[0] += 1
+            t[1] += ms
+            t[2] = max(t[2], ms)
+            t[3] = ms
+
+
+class _Timer:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, (time.perf_counter() - self.t0) * 1000)
+        return False
+
+
+def timer(name):
+    """Context manager pengukur durasi blok (ms), termasuk jika blok keluar lewat exception."""
+    return _Timer(name) if ENABLED else _NOOP
+
+
+def inc(name, n=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Jumlah, durasi dan kegagalan setiap jenis command MongoDB."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe(f"mongo.{event.command_name}", event.duration_micros / 1000)
+
+    def failed(self, event):
+        observe(f"mongo.{event.command_name}", event.duration_micros / 1000)
+        inc(f"mongo.{event.command_name}.failed")
+
+
+def listeners():
+    """Listener untuk MongoClient (kosong jika metrik nonaktif)."""
+    return [MongoCommandListener()] if ENABLED else []
+
+
+def snapshot():
+    with _lock:
+        timers = {k: {"count": c, "total_ms": round(tot, 3), "avg_ms": round(tot / c, 3),
+                      "max_ms": round(mx, 3), "last_ms": round(last, 3)}
+                  for k, (c, tot, mx, last) in _timers.items()}
+        counters = dict(_counters)
+    return {"enabled": ENABLED, "since": _started_at, "timers": timers, "counters": counters}
+
+
+def reset():
+    global _started_at
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _started_at = time.time()
+
+
+def _prom_name(name):
+    return "arsip_" + "".join(c if c.isalnum() else "_" for c in name).lower()
+
+
+def to_prometheus(snap=None):
+    snap = snap or snapshot()
+    lines = []
+    for name, t in sorted(snap["timers"].items()):
+        metric = _prom_name(name)
+        lines.append(f"# TYPE {metric}_ms summary")
+        lines.append(f"{metric}_ms_count {t['count']}")
+        lines.append(f"{metric}_ms_sum {t['total_ms']}")
+        lines.append(f"# TYPE {metric}_ms_max gauge")
+        lines.append(f"{metric}_ms_max {t['max_ms']}")
+    for name, v in sorted(snap["counters"].items()):
+        metric = _prom_name(name)
+        lines.append(f"# TYPE {metric}_total counter")
+        lines.append(f"{metric}_total {v}")
+    return "\n".join(lines) + "\n"
+
+
+def dump(path=DUMP_PATH):
+    if not path:
+        return
+    snap = snapshot()
+    data = json.dumps(snap, indent=2) if path.endswith(".json") else to_prometheus(snap)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+_dumper = None
+
+
+def start_dumper():
+    """Tulis snapshot ke DUMP_PATH setiap DUMP_INTERVAL detik (thread daemon, sekali per proses)."""
+    global _dumper
+    if not ENABLED or not DUMP_PATH or _dumper is not None:
+        return
+
+    def loop():
+        while True:
+            time.sleep(DUMP_INTERVAL)
+            try:
+                dump()
+            except OSError:
+                pass
+
+    _dumper = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+    _dumper.start()
@@ -0,0 +1,195 @@
+"""
+Ekspor inventaris arsip (judul, kategori, tahun, pengupload, tanggal upload,
+ukuran file) ke CSV/XLSX.
+
+Baris dibaca dari cursor aggregation per batch (nama pengupload di-join di
+server dengan $lookup) dan langsung ditulis ke file di EXPORT_DIR, jadi
+memori tetap konstan berapa pun jumlah dokumennya. Ekspor berjalan sebagai
+job latar belakang; UI cukup memantau progress lewat export_status().
+
+    python reports.py inventory --format xlsx --year 2024
+"""
+import csv
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from db import docs_col
+from storage import EXPORT_DIR
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX opsional
+    Workbook = None
+
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "1"))
+PROGRESS_EVERY = 1000
+# satu sheet XLSX maksimal 1.048.576 baris (termasuk header)
+XLSX_MAX_ROWS = 1_048_575
+
+COLUMNS = [
+    ("title", "Judul"),
+    ("category", "Kategori"),
+    ("year", "Tahun"),
+    ("uploader", "Pengupload"),
+    ("uploaded_at", "Tanggal Upload"),
+    ("size_bytes", "Ukuran (byte)"),
+    ("original_filename", "Nama File"),
+    ("_id", "ID"),
+]
+
+_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def formats():
+    return ["csv", "xlsx"] if Workbook is not None else ["csv"]
+
+
+def inventory_pipeline(filters=None):
+    project = {f: 1 for f, _ in COLUMNS if f not in ("_id", "uploader")}
+    project["uploader_id"] = 1
+    return [
+        {"$match": filters or {}},
+        {"$sort": {"uploaded_at": -1, "_id": -1}},
+        {"$project": project},
+        {"$lookup": {"from": "users", "localField": "uploader_id", "foreignField": "_id",
+                     "as": "uploader"}},
+        {"$set": {"uploader": {"$ifNull": [{"$arrayElemAt": ["$uploader.name", 0]},
+                                           {"$toString": "$uploader_id"}]}}},
+        {"$unset": "uploader_id"},
+    ]
+
+
+def iter_inventory(filters=None):
+    """Yield baris inventaris (list nilai sesuai COLUMNS) dari cursor aggregation."""
+    cursor = docs_col.aggregate(inventory_pipeline(filters), allowDiskUse=True, batchSize=BATCH_SIZE)
+    with cursor:
+        for d in cursor:
+            row = []
+            for field, _ in COLUMNS:
+                v = d.get(field, "")
+                if field == "_id":
+                    v = str(v)
+                elif isinstance(v, datetime):
+                    v = v.replace(microsecond=0)
+                row.append(v)
+            yield row
+
+
+def _write_csv(path, rows, progress):
+    # utf-8-sig agar Excel membaca huruf non-ASCII dengan benar
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        w = csv.writer(f)
+        w.writerow([label for _, label in COLUMNS])
+        n = 0
+        for n, row in enumerate(rows, start=1):
+            w.writerow(row)
+            if n % PROGRESS_EVERY == 0:
+                progress(n)
+        return n
+
+
+def _write_xlsx(path, rows, progress):
+    if Workbook is None:
+        raise RuntimeError("Ekspor XLSX membutuhkan paket openpyxl.")
+    # write_only: baris langsung di-stream ke file, bukan ditampung di memori
+    wb = Workbook(write_only=True)
+    header = [label for _, label in COLUMNS]
+    ws, in_sheet, n = None, XLSX_MAX_ROWS, 0
+    for n, row in enumerate(rows, start=1):
+        if in_sheet >= XLSX_MAX_ROWS:
+            ws = wb.create_sheet(f"Inventaris {len(wb.worksheets) + 1}")
+            ws.append(header)
+            in_sheet = 0
+        ws.append(row)
+        in_sheet += 1
+        if n % PROGRESS_EVERY == 0:
+            progress(n)
+    if ws is None:
+        wb.create_sheet("Inventaris 1").append(header)
+    wb.save(path)
+    return n
+
+
+def export_inventory(filters=None, fmt="csv", progress=None):
+    """
+    Tulis inventaris dokumen (filter opsional) ke EXPORT_DIR. File ditulis ke
+    nama sementara lalu di-rename setelah selesai. Returns (path, jumlah baris).
+    """
+    from documents import cleanup_exports
+
+    writer = {"csv": _write_csv, "xlsx": _write_xlsx}.get(fmt)
+    if writer is None:
+        raise ValueError(f"Format tidak dikenal: {fmt}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    cleanup_exports()
+    name = f"inventaris_{datetime.utcnow():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}.{fmt}"
+    path = os.path.join(EXPORT_DIR, name)
+    tmp = path + ".part"
+    try:
+        n = writer(tmp, iter_inventory(filters), progress or (lambda n: None))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path, n
+
+
+def _run_job(job_id, filters, fmt):
+    job = _jobs[job_id]
+    job["state"] = "running"
+
+    def progress(n):
+        job["done"] = n
+
+    try:
+        # dihitung di thread job, bukan di thread script Streamlit; tanpa filter
+        # cukup perkiraan dari metadata koleksi (O(1))
+        job["total"] = (docs_col.count_documents(filters) if filters
+                        else docs_col.estimated_document_count())
+        job["path"], job["done"] = export_inventory(filters, fmt, progress)
+        job["state"] = "done"
+    except Exception as e:
+        job["error"] = str(e)
+        job["state"] = "failed"
+    job["finished_at"] = datetime.utcnow()
+
+
+def start_export(filters=None, fmt="csv", owner_id=None):
+    """Jadwalkan ekspor inventaris di thread latar belakang. Returns id job."""
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        # buang catatan job lama; file-nya dibersihkan cleanup_exports
+        for k in [k for k, j in _jobs.items() if j["state"] in ("done", "failed")
+                  and (datetime.utcnow() - j["finished_at"]).total_seconds() > 86400]:
+            del _jobs[k]
+        _jobs[job_id] = {"id": job_id, "owner_id": owner_id, "format": fmt, "state": "queued",
+                         "done": 0, "total": None,
+                         "path": None, "error": None, "started_at": datetime.utcnow()}
+    _executor.submit(_run_job, job_id, filters, fmt)
+    return job_id
+
+
+def export_status(job_id):
+    """Salinan status job (state: queued/running/done/failed), atau None."""
+    job = _jobs.get(job_id)
+    return dict(job) if job else None
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Ekspor inventaris arsip")
+    ap.add_argument("command", choices=["inventory"])
+    ap.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+    ap.add_argument("--category")
+    ap.add_argument("--year", type=int)
+    args = ap.parse_args()
+    filters = {k: v for k, v in (("category", args.category), ("year", args.year)) if v}
+    path, n = export_inventory(filters, args.format,
+                               progress=lambda n: print(f"{n} baris...", end="\r"))
+    print(f"{n} baris ditulis ke {path}")
@@ -0,0 +1,135 @@
+# search.py
+"""
+Pencarian full-text atas judul, deskripsi dan isi PDF.
+
+Teks PDF diekstrak saat upload/ganti file (butuh paket opsional `pypdf`) dan
+disimpan di documents.content_text. Pencarian memakai text index MongoDB
+(tanpa stemming, karena bahasa Indonesia tidak didukung) sehingga hasil
+terurut berdasarkan skor relevansi dan tidak perlu collection scan.
+
+CLI:
+    python search.py reindex    # ekstrak ulang teks dokumen yang belum terindeks
+"""
+import re
+import sys
+
+from db import docs_col
+from storage import open_file
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # ekstraksi isi PDF dilewati, judul & deskripsi tetap terindeks
+    PdfReader = None
+
+TEXT_INDEX_NAME = "documents_text"
+MAX_PAGES = 200
+MAX_TEXT_CHARS = 200_000
+SNIPPET_CHARS = 240
+
+_WS_RE = re.compile(r"\s+")
+
+
+def ensure_search_index():
+    docs_col.create_index(
+        [("title", "text"), ("description", "text"), ("content_text", "text")],
+        name=TEXT_INDEX_NAME,
+        weights={"title": 10, "description": 4, "content_text": 1},
+        default_language="none",
+    )
+
+
+def extract_text(file_path):
+    """Ambil teks dari PDF (maks MAX_PAGES halaman / MAX_TEXT_CHARS karakter)."""
+    return extract_text_and_pages(file_path)[0]
+
+
+def extract_text_and_pages(file_path):
+    """Returns (teks, jumlah halaman); jumlah halaman None jika PDF tidak terbaca."""
+    if PdfReader is None:
+        return "", None
+    try:
+        with open_file(file_path) as f:
+            reader = PdfReader(f)
+            return _extract_pages(reader), len(reader.pages)
+    except Exception:
+        # PDF rusak/terenkripsi: dokumen tetap bisa dicari lewat metadata
+        return "", None
+
+
+def _extract_pages(reader):
+    parts, total = [], 0
+    for page in reader.pages[:MAX_PAGES]:
+        text = _WS_RE.sub(" ", page.extract_text() or "").strip()
+        if not text:
+            continue
+        parts.append(text)
+        total += len(text)
+        if total >= MAX_TEXT_CHARS:
+            break
+    return " ".join(parts)[:MAX_TEXT_CHARS]
+
+
+def _terms(text):
+    return [t for t in re.findall(r"\w+", text.lower()) if t]
+
+
+def highlight(snippet, text):
+    for term in sorted(set(_terms(text)), key=len, reverse=True):
+        snippet = re.sub(f"({re.escape(term)})", r"**\1**", snippet, flags=re.IGNORECASE)
+    return snippet
+
+
+def search_documents(text, filters=None, page=0, page_size=20, fields=None):
+    """
+    Cari dokumen dengan text index. Returns (docs, total); setiap doc berisi
+    field daftar, `score` dan `snippet` (potongan isi/deskripsi di sekitar
+    kata kunci pertama yang ditemukan).
+    """
+    from documents import LIST_FIELDS
+
+    match = {"$text": {"$search": text}}
+    match.update(filters or {})
+    terms = _terms(text)
+    first = terms[0] if terms else ""
+    project = {f: 1 for f in (fields or LIST_FIELDS)}
+    project["score"] = 1
+    project["snippet"] = {"$cond": [
+        {"$gte": ["$_pos", 0]},
+        {"$substrCP": ["$content_text",
+                       {"$max": [{"$subtract": ["$_pos", SNIPPET_CHARS // 3]}, 0]},
+                       SNIPPET_CHARS]},
+        {"$substrCP": [{"$ifNull": ["$description", ""]}, 0, SNIPPET_CHARS]},
+    ]}
+    pipeline = [
+        {"$match": match},
+        {"$addFields": {"score": {"$meta": "textScore"}}},
+        {"$sort": {"score": -1, "uploaded_at": -1}},
+        {"$skip": page * page_size},
+        {"$limit": page_size},
+        {"$addFields": {"_pos": {"$indexOfCP": [
+            {"$toLower": {"$ifNull": ["$content_text", ""]}}, first]}}},
+        {"$project": project},
+    ]
+    docs = list(docs_col.aggregate(pipeline))
+    total = docs_col.count_documents(match)
+    for d in docs:
+        d["snippet"] = highlight(d.get("snippet") or "", text)
+    return docs, total
+
+
+def reindex(force=False):
+    q = {} if force else {"content_text": {"$exists": False}}
+    n = 0
+    for d in docs_col.find(q, {"file_path": 1}):
+        docs_col.update_one({"_id": d["_id"]},
+                            {"$set": {"content_text": extract_text(d.get("file_path", ""))}})
+        n += 1
+    return n
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "reindex":
+        ensure_search_index()
+        print(f"{reindex(force='--force' in sys.argv)} dokumen diindeks ulang")
+    else:
+        print(__doc__)
@@ -0,0 +1,165 @@
+# sessions.py
+"""
+Sesi login berbasis token yang disimpan di MongoDB (koleksi `sessions`).
+
+Token acak diberikan ke browser (query param `sid`), yang disimpan di server
+hanya hash-nya. Sesi kadaluarsa lewat TTL index pada expires_at, sehingga
+tetap berlaku setelah proses restart dan di semua replika app. Principal
+(data user tanpa password) yang sudah divalidasi di-cache dalam LRU
+in-process selama PRINCIPAL_TTL detik, jadi rerun biasa tidak butuh round
+trip ke database; perubahan role/status user terlihat paling lambat setelah
+PRINCIPAL_TTL (langsung di proses yang melakukan perubahan).
+
+Token dibawa di URL karena Streamlit tidak bisa menulis cookie, sehingga bisa
+bocor lewat link yang disalin atau riwayat browser. Mitigasinya: sesi terikat
+ke IP client saat login (validasi ditolak dari IP lain), dan token dari URL
+ditukar dengan token baru setiap kali dipakai untuk memulihkan sesi
+(rotate_session), jadi link lama tidak berlaku lagi setelah reload. Risiko
+yang tersisa (diketahui): link yang bocor masih bisa dipakai dari IP yang
+sama (mis. NAT kantor yang sama) sebelum pemiliknya me-reload halaman.
+"""
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from db import sessions_col, users_col
+from utils import get_secret
+
+SESSION_HOURS = int(get_secret("SESSION_HOURS", 12))
+PRINCIPAL_TTL = int(get_secret("PRINCIPAL_TTL", 60))
+LRU_SIZE = 5000
+_PRINCIPAL_FIELDS = {"name": 1, "email": 1, "role": 1, "active": 1, "created_at": 1}
+
+_lru = OrderedDict()   # token_hash -> (principal, checked_at, ip)
+_lock = threading.Lock()
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _remember(key, principal, ip=None):
+    with _lock:
+        _lru[key] = (principal, time.monotonic(), ip)
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _forget(key):
+    with _lock:
+        _lru.pop(key, None)
+
+
+def _ip_mismatch(bound_ip, ip):
+    return bool(bound_ip and ip and bound_ip != ip)
+
+
+def create_session(user, ip=None):
+    """Buat sesi untuk user yang sudah login, terikat ke ip. Returns token untuk browser."""
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    sessions_col.insert_one({
+        "_id": _hash(token),
+        "user_id": user["_id"],
+        "ip": ip,
+        "created_at": now,
+        "expires_at": now + timedelta(hours=SESSION_HOURS),
+    })
+    principal = {k: user.get(k) for k in ("_id", *_PRINCIPAL_FIELDS)}
+    _remember(_hash(token), principal, ip)
+    return token
+
+
+def rotate_session(token, ip=None):
+    """
+    Tukar token (mis. dari URL) dengan token baru; token lama langsung tidak
+    berlaku. Returns (token_baru, principal) atau (None, None).
+    """
+    if not token:
+        return None, None
+    key = _hash(token)
+    _forget(key)
+    sess = sessions_col.find_one_and_delete({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+    if not sess or _ip_mismatch(sess.get("ip"), ip):
+        return None, None
+    user = users_col.find_one({"_id": sess["user_id"], "active": True}, _PRINCIPAL_FIELDS)
+    if not user:
+        return None, None
+    return create_session(user, sess.get("ip") or ip), user
+
+
+def validate_session(token, ip=None):
+    """Returns principal (dict user tanpa password) atau None jika sesi tidak berlaku."""
+    if not token:
+        return None
+    key = _hash(token)
+    with _lock:
+        hit = _lru.get(key)
+        if hit and time.monotonic() - hit[1] < PRINCIPAL_TTL:
+            if _ip_mismatch(hit[2], ip):
+                return None
+            _lru.move_to_end(key)
+            return hit[0]
+
+    now = datetime.utcnow()
+    # sekaligus perpanjang masa berlaku (sliding expiry)
+    sess = sessions_col.find_one_and_update(
+        {"_id": key, "expires_at": {"$gt": now}},
+        {"$set": {"expires_at": now + timedelta(hours=SESSION_HOURS)}},
+        projection={"user_id": 1, "ip": 1})
+    if sess and _ip_mismatch(sess.get("ip"), ip):
+        return None
+    user = sess and users_col.find_one({"_id": sess["user_id"], "active": True}, _PRINCIPAL_FIELDS)
+    if not user:
+        _forget(key)
+        return None
+    _remember(key, user, sess.get("ip"))
+    return user
+
+
+def session_id(token):
+    """Id sesi (hash token) untuk mengikat URL file ke sesi tanpa membocorkan token."""
+    return _hash(token) if token else ""
+
+
+def session_active(sid):
+    """
+    True jika sesi dengan id sid (lihat session_id) masih berlaku dan usernya
+    aktif. Dipakai file server per request; hasil positif ikut LRU principal.
+    """
+    if not sid:
+        return False
+    with _lock:
+        hit = _lru.get(sid)
+        if hit and time.monotonic() - hit[1] < PRINCIPAL_TTL:
+            return True
+    sess = sessions_col.find_one({"_id": sid, "expires_at": {"$gt": datetime.utcnow()}},
+                                 {"user_id": 1, "ip": 1})
+    user = sess and users_col.find_one({"_id": sess["user_id"], "active": True}, _PRINCIPAL_FIELDS)
+    if not user:
+        return False
+    _remember(sid, user, sess.get("ip"))
+    return True
+
+
+def revoke_session(token):
+    if token:
+        key = _hash(token)
+        _forget(key)
+        sessions_col.delete_one({"_id": key})
+
+
+def invalidate_user_sessions(user_id, revoke=False):
+    """
+    Paksa validasi ulang semua sesi milik user_id (mis. setelah role diubah).
+    revoke=True sekaligus menghapus sesinya (user harus login ulang).
+    """
+    with _lock:
+        for key in [k for k, (p, *_) in _lru.items() if p["_id"] == user_id]:
+            del _lru[key]
+    if revoke:
+        sessions_col.delete_many({"user_id": user_id})
@@ -0,0 +1,154 @@
+# stats.py
+"""
+Statistik arsip yang dipelihara secara inkremental di koleksi `stats`.
+
+Satu dokumen (_id "archive") berisi total dokumen & byte, serta counter
+per kategori, tahun, bulan upload dan uploader. documents.py memanggil
+apply_delta() dengan $inc setiap kali dokumen ditambah, dihapus, dipindah
+kategori/tahun atau file-nya diganti, sehingga Dashboard cukup membaca
+satu dokumen kecil.
+
+CLI:
+    python stats.py reconcile [--backfill-sizes]   # bangun ulang counter dari documents
+    python stats.py verify                         # bandingkan counter dengan hasil agregasi
+"""
+import sys
+from datetime import datetime
+
+from db import docs_col, stats_col
+
+STATS_ID = "archive"
+GROUPS = {
+    "category": {"$ifNull": ["$category", "Lainnya"]},
+    "year": {"$toString": "$year"},
+    "month": {"$dateToString": {"format": "%Y-%m", "date": "$uploaded_at"}},
+    "uploader": {"$toString": "$uploader_id"},
+}
+
+
+def _enc(key):
+    # nama field MongoDB tidak boleh mengandung "." atau diawali "$"
+    return str(key).replace("$", "＄").replace(".", "．")
+
+
+def _dec(key):
+    return key.replace("＄", "$").replace("．", ".")
+
+
+def _group_keys(doc):
+    uploaded_at = doc.get("uploaded_at")
+    return {
+        "category": "Lainnya" if doc.get("category") is None else doc["category"],
+        "year": doc.get("year"),
+        "month": uploaded_at.strftime("%Y-%m") if isinstance(uploaded_at, datetime) else None,
+        "uploader": doc.get("uploader_id"),
+    }
+
+
+def delta(doc, sign=1, into=None):
+    """Tambahkan kontribusi satu dokumen (sign +1/-1) ke dict $inc `into`."""
+    inc = {} if into is None else into
+    size = int(doc.get("size_bytes") or 0) * sign
+
+    def add(field, n):
+        inc[field] = inc.get(field, 0) + n
+
+    add("total", sign)
+    add("bytes", size)
+    for group, key in _group_keys(doc).items():
+        if key is None:
+            continue
+        add(f"{group}.{_enc(key)}.n", sign)
+        add(f"{group}.{_enc(key)}.bytes", size)
+    return inc
+
+
+def apply_delta(inc):
+    # tanpa upsert: sebelum counter dibangun (ensure_stats/read_stats), delta
+    # diabaikan karena reconcile() nanti menghitungnya dari documents
+    inc = {k: v for k, v in inc.items() if v}
+    if inc:
+        stats_col.update_one({"_id": STATS_ID}, {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}})
+
+
+def ensure_stats():
+    """Bangun counter (dengan backfill size_bytes) jika belum ada. Dipanggil saat startup."""
+    if stats_col.find_one({"_id": STATS_ID}, {"_id": 1}) is None:
+        reconcile(backfill_sizes=True)
+
+
+def _decode(doc):
+    return {
+        "total": doc.get("total", 0),
+        "bytes": doc.get("bytes", 0),
+        **{g: {_dec(k): v for k, v in (doc.get(g) or {}).items() if v.get("n")} for g in GROUPS},
+    }
+
+
+def _aggregate():
+    facets = {g: [{"$group": {"_id": expr, "n": {"$sum": 1},
+                              "bytes": {"$sum": {"$ifNull": ["$size_bytes", 0]}}}}]
+              for g, expr in GROUPS.items()}
+    facets["month"].insert(0, {"$match": {"uploaded_at": {"$type": "date"}}})
+    facets["totals"] = [{"$group": {"_id": None, "n": {"$sum": 1},
+                                    "bytes": {"$sum": {"$ifNull": ["$size_bytes", 0]}}}}]
+    res = next(docs_col.aggregate([{"$facet": facets}], allowDiskUse=True), {})
+    totals = (res.get("totals") or [{"n": 0, "bytes": 0}])[0]
+    doc = {"_id": STATS_ID, "total": totals["n"], "bytes": totals["bytes"]}
+    for g in GROUPS:
+        doc[g] = {_enc(r["_id"]): {"n": r["n"], "bytes": r["bytes"]}
+                  for r in res.get(g, []) if r["_id"] is not None}
+    return doc
+
+
+def read_stats():
+    """Counter terkini (satu find_one). Dibangun dari documents jika belum ada."""
+    doc = stats_col.find_one({"_id": STATS_ID})
+    if doc is None:
+        doc = reconcile()
+    return _decode(doc)
+
+
+def reconcile(backfill_sizes=False):
+    """Bangun ulang counter dari koleksi documents (memperbaiki drift)."""
+    if backfill_sizes:
+        from storage import file_exists, file_size
+        for d in docs_col.find({"size_bytes": {"$exists": False}}, {"file_path": 1}):
+            path = d.get("file_path")
+            if file_exists(path):
+                docs_col.update_one({"_id": d["_id"]}, {"$set": {"size_bytes": file_size(path)}})
+    doc = _aggregate()
+    doc["updated_at"] = datetime.utcnow()
+    stats_col.replace_one({"_id": STATS_ID}, doc, upsert=True)
+    return doc
+
+
+def verify():
+    """Returns daftar selisih antara counter tersimpan dan hasil agregasi."""
+    stored = _decode(stats_col.find_one({"_id": STATS_ID}) or {})
+    actual = _decode(_aggregate())
+    diffs = []
+    for key in ("total", "bytes"):
+        if stored[key] != actual[key]:
+            diffs.append((key, stored[key], actual[key]))
+    for g in GROUPS:
+        for k in sorted(set(stored[g]) | set(actual[g])):
+            a, b = stored[g].get(k), actual[g].get(k)
+            if a != b:
+                diffs.append((f"{g}.{k}", a, b))
+    return diffs
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "reconcile":
+        doc = reconcile(backfill_sizes="--backfill-sizes" in sys.argv)
+        print(f"Counter dibangun ulang: {doc['total']} dokumen, {doc['bytes']} byte")
+    elif cmd == "verify":
+        diffs = verify()
+        for name, stored, actual in diffs:
+            print(f"DRIFT {name}: tersimpan={stored} seharusnya={actual}")
+        print("OK" if not diffs else f"{len(diffs)} selisih")
+        sys.exit(1 if diffs else 0)
+    else:
+        print(__doc__)
@@ -0,0 +1,618 @@
+# storage.py
+"""
+Lapisan penyimpanan file arsip. Backend dipilih lewat STORAGE_BACKEND:
+
+- "local": satu file per upload, storage/<uuid>.<ext> (perilaku lama)
+- "cas"  : content-addressed, storage/cas/ab/cd/<sha256>.<ext>. Reference
+           count disimpan di koleksi `blobs`, sehingga upload file yang sama
+           berulang kali tidak memakan ruang disk tambahan.
+- "gridfs": file disimpan di GridFS (bucket `files`) dengan referensi
+           gridfs://<id>, sehingga semua replika app melihat isi yang sama.
+
+Jika STORAGE_CHUNKED aktif (default), file ditulis dalam format ber-chunk
+dengan kompresi per chunk (lihat chunked.py). Pembacaan selalu lewat
+open_file()/file_size(), yang mengenali format lama maupun baru.
+
+documents.file_path berisi referensi file: path di disk, atau gridfs://<id>.
+Baca, cek dan hapus selalu lewat fungsi modul ini (open_file, file_exists,
+release_file, ...) yang memilih backend berdasarkan referensi, sehingga file
+lama dan baru dari backend berbeda bisa hidup berdampingan.
+
+Upload dari aplikasi masuk lewat ingest_file(): isi disalin per chunk ke
+file sementara sambil dihitung ukuran, sha256 dan struktur PDF-nya (satu
+kali baca), ditolak jika bukan PDF atau melebihi MAX_UPLOAD_BYTES, lalu
+di-rename atomik ke tempatnya.
+
+Penghapusan dari aplikasi memakai release_file_later(): referensi dilepas
+saat itu juga, file fisik dihapus belakangan oleh job `file_delete` (jobs.py)
+dan hanya jika sudah tidak dirujuk dokumen mana pun.
+
+CLI:
+    python storage.py gc [--dry-run]   # bersihkan blob yatim, hitung ulang refcount
+    python storage.py stats            # penghematan dedup
+    python storage.py migrate-chunked [--dry-run]   # konversi file lama ke format ber-chunk
+    python storage.py migrate-gridfs [--workers N] [--dry-run]   # pindahkan file disk ke GridFS
+"""
+import hashlib
+import os
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from bson.objectid import ObjectId
+from gridfs.errors import NoFile
+
+import metrics
+from db import blobs_col, docs_col, files_bucket
+from utils import STORAGE_DIR, get_secret
+from chunked import CHUNK_SIZE, ChunkedReader, ChunkedWriter, is_chunked, open_chunked
+
+STORAGE_BACKEND = get_secret("STORAGE_BACKEND", "cas")
+STORAGE_CHUNKED = str(get_secret("STORAGE_CHUNKED", "1")).lower() not in ("0", "false", "no")
+STORAGE_COMPRESSION = str(get_secret("STORAGE_COMPRESSION", "1")).lower() not in ("0", "false", "no")
+CAS_DIR = os.path.join(STORAGE_DIR, "cas")
+TMP_DIR = os.path.join(STORAGE_DIR, "tmp")
+THUMB_DIR = os.path.join(STORAGE_DIR, "thumbs")
+EXPORT_DIR = os.path.join(STORAGE_DIR, "exports")
+GRIDFS_PREFIX = "gridfs://"
+MAX_UPLOAD_BYTES = int(get_secret("MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+
+
+class UploadRejected(ValueError):
+    """File upload ditolak (bukan PDF valid, atau terlalu besar)."""
+
+
+class FileInspector:
+    """
+    Diumpankan setiap chunk yang disalin (_copy_stream): hitung ukuran dan
+    sha256, tolak jika melebihi max_bytes, dan (jika require_pdf) periksa
+    header %PDF-, penanda %%EOF di akhir file serta jumlah objek /Type /Page.
+    """
+    # karakter sesudah "Page" wajib ada, agar "/Pages" yang terpotong di batas chunk tidak terhitung
+    _PAGE_RE = re.compile(rb"/Type\s*/Page(?=[^A-Za-z])")
+    _HEAD = 1024
+    _TAIL = 2048
+    _CARRY = 32
+
+    def __init__(self, max_bytes=None, require_pdf=False):
+        self.max_bytes = max_bytes
+        self.require_pdf = require_pdf
+        self.size = 0
+        self.pages = 0
+        self._sha = hashlib.sha256()
+        self._head = b""
+        self._tail = b""
+
+    def update(self, chunk):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise UploadRejected(f"File melebihi batas {self.max_bytes // (1024 * 1024)} MB")
+        self._sha.update(chunk)
+        if len(self._head) < self._HEAD:
+            self._head += chunk[:self._HEAD - len(self._head)]
+            if self.require_pdf and len(self._head) >= self._HEAD:
+                self._check_header()
+        # cocokkan pola yang terpotong batas chunk lewat sisa chunk sebelumnya
+        carry = self._tail[-self._CARRY:]
+        buf = carry + chunk
+        self.pages += sum(1 for m in self._PAGE_RE.finditer(buf) if m.end() >= len(carry))
+        self._tail = (self._tail + chunk)[-self._TAIL:]
+
+    def _check_header(self):
+        if b"%PDF-" not in self._head:
+            raise UploadRejected("File bukan PDF (header %PDF- tidak ditemukan)")
+
+    def finish(self):
+        """Validasi akhir sebelum file disimpan permanen."""
+        if self.require_pdf:
+            self._check_header()
+            if b"%%EOF" not in self._tail:
+                raise UploadRejected("PDF tidak lengkap (penanda %%EOF tidak ditemukan)")
+
+    def hexdigest(self):
+        return self._sha.hexdigest()
+
+    def info(self):
+        # PDF dengan object stream menyembunyikan objek halaman; page_count None
+        return {"size_bytes": self.size, "sha256": self.hexdigest(),
+                "page_count": self.pages or None}
+
+
+def _copy_stream(src, dst, hasher=None):
+    """
+    Salin src -> dst per chunk (memori terbatas). hasher (hashlib atau
+    FileInspector) menerima setiap chunk. Returns jumlah byte.
+    """
+    if hasattr(src, "seek"):
+        src.seek(0)
+    size = 0
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if hasher is not None:
+            hasher.update(chunk)
+        dst.write(chunk)
+        size += len(chunk)
+    metrics.inc("storage.bytes_written", size)
+    return size
+
+
+class _CountingReader:
+    """Proxy file yang mencatat byte terbaca ke metrics (hanya saat metrik aktif)."""
+
+    def __init__(self, f):
+        self._f = f
+
+    def read(self, n=-1):
+        data = self._f.read(n)
+        metrics.inc("storage.bytes_read", len(data))
+        return data
+
+    def readinto(self, b):
+        n = self._f.readinto(b)
+        metrics.inc("storage.bytes_read", n or 0)
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+        return False
+
+
+def _referenced(ref):
+    return docs_col.find_one({"file_path": ref}, {"_id": 1}) is not None
+
+
+def _write_file(src, path, hasher=None):
+    """Tulis stream src ke path (ber-chunk jika STORAGE_CHUNKED). Returns ukuran asli."""
+    with open(path, "wb") as f:
+        if not STORAGE_CHUNKED:
+            return _copy_stream(src, f, hasher)
+        writer = ChunkedWriter(f, compress=STORAGE_COMPRESSION)
+        size = _copy_stream(src, writer, hasher)
+        writer.finish()
+        return size
+
+
+class _DiskFiles:
+    """Operasi baca untuk backend berbasis disk lokal."""
+
+    def exists(self, path):
+        return bool(path) and os.path.isfile(path)
+
+    def open(self, path):
+        if is_chunked(path):
+            return open_chunked(path)
+        return open(path, "rb")
+
+    def size(self, path):
+        if is_chunked(path):
+            with ChunkedReader(path) as r:
+                return r.size
+        return os.path.getsize(path)
+
+    def etag(self, path):
+        info = os.stat(path)
+        return f"{info.st_size:x}-{info.st_mtime_ns:x}"
+
+
+class LocalBackend(_DiskFiles):
+    name = "local"
+
+    def save(self, uploaded_file, inspector=None):
+        os.makedirs(TMP_DIR, exist_ok=True)
+        ext = os.path.splitext(uploaded_file.name)[1]
+        name = uuid.uuid4().hex
+        path = os.path.join(STORAGE_DIR, f"{name}{ext}")
+        tmp_path = os.path.join(TMP_DIR, f"{name}.part")
+        try:
+            _write_file(uploaded_file, tmp_path, inspector)
+            if inspector is not None:
+                inspector.finish()
+            os.replace(tmp_path, path)
+            return path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def release(self, path):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def unref(self, path):
+        pass
+
+    def purge(self, path):
+        if os.path.exists(path) and not _referenced(path):
+            os.remove(path)
+            return True
+        return False
+
+
+class ContentAddressedBackend(_DiskFiles):
+    name = "cas"
+
+    def blob_path(self, sha256, ext):
+        return os.path.join(CAS_DIR, sha256[:2], sha256[2:4], f"{sha256}{ext.lower()}")
+
+    def save(self, uploaded_file, inspector=None):
+        os.makedirs(TMP_DIR, exist_ok=True)
+        ext = os.path.splitext(uploaded_file.name)[1]
+        tmp_path = os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.part")
+        hasher = inspector or hashlib.sha256()
+        try:
+            size = _write_file(uploaded_file, tmp_path, hasher)
+            if inspector is not None:
+                inspector.finish()
+            sha256 = hasher.hexdigest()
+            blob = blobs_col.find_one({"_id": sha256})
+            if blob and os.path.exists(blob["path"]):
+                path = blob["path"]
+            else:
+                path = blob["path"] if blob else self.blob_path(sha256, ext)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            blobs_col.update_one(
+                {"_id": sha256},
+                {"$inc": {"refcount": 1},
+                 "$setOnInsert": {"path": path, "size": size, "created_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            return path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def release(self, path):
+        blob = blobs_col.find_one_and_update(
+            {"path": path}, {"$inc": {"refcount": -1}}, return_document=True)
+        if blob is None:
+            # tidak tercatat (mis. data lama), hapus langsung
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        if blob["refcount"] <= 0:
+            res = blobs_col.delete_one({"_id": blob["_id"], "refcount": {"$lte": 0}})
+            if res.deleted_count and os.path.exists(path):
+                os.remove(path)
+
+    def unref(self, path):
+        """Turunkan refcount; catatan blob dihapus di 0, file fisik dibiarkan untuk purge()."""
+        blob = blobs_col.find_one_and_update(
+            {"path": path}, {"$inc": {"refcount": -1}}, return_document=True)
+        if blob is not None and blob["refcount"] <= 0:
+            blobs_col.delete_one({"_id": blob["_id"], "refcount": {"$lte": 0}})
+
+    def purge(self, path):
+        # blob yang diupload ulang sejak unref() tercatat lagi di `blobs`
+        if (os.path.exists(path) and blobs_col.find_one({"path": path}, {"_id": 1}) is None
+                and not _referenced(path)):
+            os.remove(path)
+            return True
+        return False
+
+
+class GridFSBackend:
+    name = "gridfs"
+
+    def _id(self, ref):
+        return ObjectId(ref[len(GRIDFS_PREFIX):])
+
+    def save(self, uploaded_file, inspector=None, filename=None):
+        hasher = inspector or hashlib.sha256()
+        grid_in = files_bucket.open_upload_stream(filename or os.path.basename(uploaded_file.name))
+        try:
+            _copy_stream(uploaded_file, grid_in, hasher)
+            if inspector is not None:
+                inspector.finish()
+            grid_in.sha256 = hasher.hexdigest()
+        except Exception:
+            grid_in.abort()
+            raise
+        grid_in.close()
+        return f"{GRIDFS_PREFIX}{grid_in._id}"
+
+    def release(self, ref):
+        try:
+            files_bucket.delete(self._id(ref))
+        except NoFile:
+            pass
+
+    def unref(self, ref):
+        pass
+
+    def purge(self, ref):
+        if _referenced(ref) or not self.exists(ref):
+            return False
+        self.release(ref)
+        return True
+
+    def exists(self, ref):
+        return next(files_bucket.find({"_id": self._id(ref)}).limit(1), None) is not None
+
+    def open(self, ref):
+        return files_bucket.open_download_stream(self._id(ref))
+
+    def size(self, ref):
+        with self.open(ref) as f:
+            return f.length
+
+    def etag(self, ref):
+        # file GridFS tidak pernah diubah setelah ditulis
+        return str(self._id(ref))
+
+
+_BACKENDS = {
+    "local": LocalBackend(),
+    "cas": ContentAddressedBackend(),
+    "gridfs": GridFSBackend(),
+}
+
+
+def get_backend(name=None):
+    return _BACKENDS[name or STORAGE_BACKEND]
+
+
+def _is_cas_path(path):
+    return os.path.abspath(path).startswith(os.path.abspath(CAS_DIR) + os.sep)
+
+
+def backend_for(ref):
+    if ref.startswith(GRIDFS_PREFIX):
+        return _BACKENDS["gridfs"]
+    return _BACKENDS["cas"] if _is_cas_path(ref) else _BACKENDS["local"]
+
+
+def save_file(uploaded_file):
+    """Simpan file upload dengan backend aktif. Returns path untuk file_path."""
+    return get_backend().save(uploaded_file)
+
+
+def ingest_file(uploaded_file, require_pdf=True, max_bytes=None):
+    """
+    Simpan file upload dengan validasi dalam satu kali salin. Raises
+    UploadRejected (tidak ada file yang tertinggal). Returns (path, info)
+    dengan info berisi size_bytes, sha256 dan page_count.
+    """
+    inspector = FileInspector(MAX_UPLOAD_BYTES if max_bytes is None else max_bytes, require_pdf)
+    path = get_backend().save(uploaded_file, inspector=inspector)
+    return path, inspector.info()
+
+
+def release_file(path):
+    """Lepaskan file milik dokumen yang dihapus/diganti."""
+    if path:
+        backend_for(path).release(path)
+
+
+def release_file_later(paths, delay=None):
+    """
+    Lepas referensi file (satu path atau list) sekarang dan antrikan
+    penghapusan fisiknya sebagai job `file_delete`. Panggil setelah dokumen
+    yang merujuknya dihapus/diubah.
+    """
+    from jobs import enqueue, DELETE_DELAY
+
+    paths = [p for p in ([paths] if isinstance(paths, str) or paths is None else paths) if p]
+    if not paths:
+        return None
+    for path in paths:
+        backend_for(path).unref(path)
+    return enqueue("file_delete", {"paths": paths},
+                   delay=DELETE_DELAY if delay is None else delay)
+
+
+def purge_file(path):
+    """Hapus file fisik jika tidak lagi dirujuk dokumen/blob. Idempoten."""
+    return bool(path) and backend_for(path).purge(path)
+
+
+def file_exists(path):
+    return bool(path) and backend_for(path).exists(path)
+
+
+def open_file(path):
+    """Buka file arsip untuk dibaca (seekable), dari backend mana pun."""
+    f = backend_for(path).open(path)
+    if metrics.ENABLED:
+        metrics.inc("storage.files_opened")
+        return _CountingReader(f)
+    return f
+
+
+def file_size(path):
+    """Ukuran isi asli file (bukan ukuran di disk)."""
+    return backend_for(path).size(path)
+
+
+def file_etag(path):
+    """Penanda versi isi file, untuk HTTP ETag."""
+    return backend_for(path).etag(path)
+
+
+def iter_file(path, start=0, end=None, chunk_size=CHUNK_SIZE):
+    """Yield isi file dari byte start sampai end (inklusif) per chunk."""
+    with open_file(path) as f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            data = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+
+
+# ---------------------------
+# Maintenance
+# ---------------------------
+def dedup_stats():
+    """Ukuran logis (semua referensi) vs fisik (blob unik) di backend cas."""
+    res = next(blobs_col.aggregate([{"$group": {
+        "_id": None,
+        "blobs": {"$sum": 1},
+        "refs": {"$sum": "$refcount"},
+        "physical_bytes": {"$sum": "$size"},
+        "logical_bytes": {"$sum": {"$multiply": ["$size", "$refcount"]}},
+    }}]), None) or {"blobs": 0, "refs": 0, "physical_bytes": 0, "logical_bytes": 0}
+    res.pop("_id", None)
+    res["saved_bytes"] = res["logical_bytes"] - res["physical_bytes"]
+    return res
+
+
+def collect_garbage(dry_run=False, min_age=3600):
+    """
+    Hitung ulang refcount dari koleksi documents, lalu hapus blob tanpa
+    referensi dan file di CAS_DIR yang tidak tercatat di `blobs`.
+    Blob/file lebih muda dari min_age detik dilewati (upload yang sedang berjalan).
+    """
+    refs = {r["_id"]: r["n"] for r in docs_col.aggregate([
+        {"$match": {"file_path": {"$regex": "^" + re.escape(CAS_DIR)}}},
+        {"$group": {"_id": "$file_path", "n": {"$sum": 1}}},
+    ])}
+    removed, fixed, freed = 0, 0, 0
+    known = set()
+    cutoff = datetime.utcnow() - timedelta(seconds=min_age)
+    for blob in blobs_col.find({}, {"path": 1, "size": 1, "refcount": 1, "created_at": 1}):
+        known.add(os.path.abspath(blob["path"]))
+        if blob.get("created_at") and blob["created_at"] > cutoff:
+            continue
+        n = refs.get(blob["path"], 0)
+        if n == 0:
+            removed += 1
+            freed += blob.get("size", 0)
+            if not dry_run:
+                blobs_col.delete_one({"_id": blob["_id"]})
+                if os.path.exists(blob["path"]):
+                    os.remove(blob["path"])
+            continue
+        if n != blob.get("refcount"):
+            fixed += 1
+            if not dry_run:
+                blobs_col.update_one({"_id": blob["_id"]}, {"$set": {"refcount": n}})
+
+    now = time.time()
+    for top in (CAS_DIR, TMP_DIR):
+        for root, _dirs, files in os.walk(top):
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.abspath(path) in known or now - os.path.getmtime(path) < min_age:
+                    continue
+                removed += 1
+                freed += os.path.getsize(path)
+                if not dry_run:
+                    os.remove(path)
+    return {"removed": removed, "refcount_fixed": fixed, "freed_bytes": freed}
+
+
+def migrate_to_chunked(dry_run=False):
+    """
+    Konversi file format lama di STORAGE_DIR ke format ber-chunk, di tempat
+    (path tidak berubah, jadi documents.file_path tetap valid). Penulisan ke
+    file sementara lalu os.replace, sehingga pembaca yang sedang berjalan
+    tidak melihat file setengah jadi.
+    """
+    converted, before, after = 0, 0, 0
+    skip = {os.path.abspath(TMP_DIR), os.path.abspath(THUMB_DIR), os.path.abspath(EXPORT_DIR)}
+    for root, dirs, files in os.walk(STORAGE_DIR):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) not in skip]
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(".part") or is_chunked(path):
+                continue
+            converted += 1
+            before += os.path.getsize(path)
+            if dry_run:
+                continue
+            tmp = f"{path}.{uuid.uuid4().hex}.part"
+            try:
+                with open(path, "rb") as src, open(tmp, "wb") as f:
+                    writer = ChunkedWriter(f, compress=STORAGE_COMPRESSION)
+                    _copy_stream(src, writer)
+                    writer.finish()
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            after += os.path.getsize(path)
+    return {"converted": converted, "bytes_before": before, "bytes_after": after}
+
+
+def _migrate_one_to_gridfs(doc):
+    """Returns "moved", "skipped" (diganti selama migrasi) atau "missing"."""
+    old = doc["file_path"]
+    if not file_exists(old):
+        return "missing"
+    with open_file(old) as src:
+        ref = _BACKENDS["gridfs"].save(src, filename=doc.get("original_filename") or os.path.basename(old))
+    # compare-and-set: lewati jika file dokumen diganti selama migrasi
+    res = docs_col.update_one({"_id": doc["_id"], "file_path": old}, {"$set": {"file_path": ref}})
+    if res.modified_count:
+        release_file(old)
+        return "moved"
+    _BACKENDS["gridfs"].release(ref)
+    return "skipped"
+
+
+def migrate_to_gridfs(workers=8, dry_run=False):
+    """
+    Pindahkan file dokumen yang masih di disk ke GridFS secara paralel.
+    Blob CAS yang dipakai beberapa dokumen disalin per dokumen (GridFS tidak
+    memakai refcount), lalu refcount blob diturunkan lewat release_file().
+    Dokumen dibaca dari cursor dan paling banyak workers*4 file diproses
+    bersamaan, jadi memori tidak bergantung pada jumlah dokumen.
+    """
+    docs = docs_col.find({"file_path": {"$not": {"$regex": "^" + re.escape(GRIDFS_PREFIX)}}},
+                         {"file_path": 1, "original_filename": 1}, no_cursor_timeout=True)
+    counts = {"moved": 0, "skipped": 0, "missing": 0}
+    failed = []
+    try:
+        if dry_run:
+            return {"pending": sum(1 for d in docs if file_exists(d.get("file_path")))}
+        window = workers * 4
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+
+            def drain(block):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED if block else ALL_COMPLETED)
+                for fut in done:
+                    d = pending.pop(fut)
+                    try:
+                        counts[fut.result()] += 1
+                    except Exception as e:
+                        failed.append((str(d["_id"]), str(e)))
+
+            for d in docs:
+                pending[pool.submit(_migrate_one_to_gridfs, d)] = d
+                if len(pending) >= window:
+                    drain(block=True)
+            while pending:
+                drain(block=False)
+    finally:
+        docs.close()
+    return {**counts, "failed": failed}
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "gc":
+        print(collect_garbage(dry_run="--dry-run" in sys.argv))
+    elif cmd == "stats":
+        print(dedup_stats())
+    elif cmd == "migrate-chunked":
+        print(migrate_to_chunked(dry_run="--dry-run" in sys.argv))
+    elif cmd == "migrate-gridfs":
+        workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else 8
+        print(migrate_to_gridfs(workers=workers, dry_run="--dry-run" in sys.argv))
+    else:
+        print(__doc__)
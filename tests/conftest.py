@@ -0,0 +1,43 @@
+"""
+Fixture bersama: MongoDB diganti mongomock dan storage ditaruh di direktori
+sementara. Modul aplikasi membaca koneksi & STORAGE_DIR saat import, jadi
+penggantian dilakukan sebelum modul apa pun di-import.
+"""
+import os
+import sys
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+import mongomock.gridfs  # noqa: E402
+import pymongo  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def app_modules(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("arsip")
+    os.chdir(workdir)
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost")
+    os.environ["JOBS_EMBEDDED"] = "0"
+    mongomock.gridfs.enable_gridfs_integration()
+    pymongo.MongoClient = mongomock.MongoClient
+    sys.path.insert(0, ROOT)
+    import db
+    import documents
+    import stats
+    return db, documents, stats
+
+
+@pytest.fixture
+def archive(app_modules):
+    db, documents, stats = app_modules
+    for col in (db.docs_col, db.stats_col, db.blobs_col, db.jobs_col):
+        col.delete_many({})
+    documents._invalidate_stats()
+    # file dari test sebelumnya akan terlihat sebagai yatim oleh orphan_scan
+    for dirpath, _dirs, files in os.walk("storage"):
+        for name in files:
+            os.remove(os.path.join(dirpath, name))
+    return app_modules
@@ -0,0 +1,17 @@
+from bson.objectid import ObjectId
+
+from test_stats import pdf, upload
+
+
+def test_page_count_prefers_parser_over_raw_count(archive, monkeypatch):
+    db, documents, _ = archive
+    # incremental update: objek halaman ditulis ulang, mentah terhitung 4
+    data = pdf("revisi", pages=4)
+
+    monkeypatch.setattr(documents, "extract_text_and_pages", lambda path: ("", 2))
+    doc_id = upload(documents, data=data)
+    assert db.docs_col.find_one({"_id": ObjectId(doc_id)})["page_count"] == 2
+
+    monkeypatch.setattr(documents, "extract_text_and_pages", lambda path: ("", None))
+    doc_id = upload(documents, title="Lain", data=pdf("tak terbaca", pages=4))
+    assert db.docs_col.find_one({"_id": ObjectId(doc_id)})["page_count"] == 4
@@ -0,0 +1,20 @@
+"""Baris manifest yang tidak valid dilaporkan, tidak menghentikan ingest."""
+from test_stats import pdf
+
+
+def test_invalid_manifest_rows_reported(app_modules, tmp_path):
+    import ingest
+    (tmp_path / "a.pdf").write_bytes(pdf("a"))
+    (tmp_path / "b.pdf").write_bytes(pdf("b"))
+    manifest = [
+        {"file": "a.pdf", "year": "2023"},
+        {"file": "b.pdf", "year": "dua ribu"},
+        {"title": "tanpa file"},
+        {"file": "hilang.pdf"},
+        "bukan object",
+    ]
+    items, failed = ingest.build_items(ingest._DirSource(str(tmp_path)), manifest, "Lainnya", 2024)
+
+    assert [(i["filename"], i["year"]) for i in items] == [("a.pdf", 2023)]
+    assert [name for name, _ in failed] == ["b.pdf", "baris 3", "hilang.pdf", "baris 5"]
+    assert "tahun tidak valid" in failed[0][1]
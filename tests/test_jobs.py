@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from bson.objectid import ObjectId
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n%%EOF\n")
+    os.utime(path, (0, 0))  # lebih tua dari min_age
+
+
+def _run_scan(jobs, checkpoint=None):
+    job = {"_id": ObjectId(), "params": {"min_age": 0}, "checkpoint": checkpoint or {}}
+    jobs.jobs_col.insert_one({**job, "worker": "test", "state": "running"})
+    ctx = jobs.JobContext(job, "test")
+    jobs._orphan_scan(ctx)
+    return ctx
+
+
+def test_orphan_scan_resumes_in_walk_order(archive, monkeypatch):
+    import jobs
+    monkeypatch.setattr(jobs, "JOB_BATCH_PAUSE", 0)
+    _touch("storage/ffff.pdf")
+    _touch("storage/cas/00/00/orphan.pdf")
+    _touch("storage/cas.pdf")
+
+    j = os.path.join
+    full = _run_scan(jobs)
+    assert full.progress["orphans_sample"] == [
+        j("storage", "cas.pdf"), j("storage", "cas", "00", "00", "orphan.pdf"), j("storage", "ffff.pdf")]
+
+    # urutan walk sama dengan urutan string, jadi checkpoint di tengah tidak melewatkan subtree
+    resumed = _run_scan(jobs, {"phase": "files", "after": j("storage", "cas.pdf")})
+    assert resumed.progress["orphans_sample"] == [
+        j("storage", "cas", "00", "00", "orphan.pdf"), j("storage", "ffff.pdf")]
+
+
+def test_heartbeat_renews_lease_mid_batch(archive, monkeypatch):
+    import jobs
+    job = {"_id": ObjectId(), "params": {}, "checkpoint": {}}
+    jobs.jobs_col.insert_one({**job, "worker": "test", "state": "running", "heartbeat_at": None})
+    ctx = jobs.JobContext(job, "test")
+
+    ctx.heartbeat()  # belum JOB_LEASE/3 sejak mulai: tidak menulis
+    assert jobs.jobs_col.find_one({"_id": job["_id"]})["heartbeat_at"] is None
+    ctx._beat -= jobs.JOB_LEASE
+    ctx.heartbeat()
+    assert jobs.jobs_col.find_one({"_id": job["_id"]})["heartbeat_at"] is not None
+
+    jobs.jobs_col.update_one({"_id": job["_id"]}, {"$set": {"worker": "lain"}})
+    ctx._beat -= jobs.JOB_LEASE
+    with pytest.raises(jobs.JobLost):
+        ctx.heartbeat()
+
+
+def test_worker_survives_queue_errors(archive, monkeypatch):
+    import jobs
+    calls = []
+
+    def flaky_claim(worker_id, types=None):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("server selection timeout")
+        return None
+
+    monkeypatch.setattr(jobs, "claim", flaky_claim)
+    monkeypatch.setattr(jobs, "JOB_POLL_INTERVAL", 0)
+    jobs.work(once=True)
+    assert len(calls) == 2
@@ -0,0 +1,45 @@
+"""Token sesi dari URL: terikat ke IP client dan dirotasi saat dipakai."""
+import pytest
+
+
+@pytest.fixture
+def sessions(app_modules):
+    db = app_modules[0]
+    import sessions
+    db.sessions_col.delete_many({})
+    db.users_col.delete_many({})
+    db.users_col.insert_one({"_id": "u1", "email": "a@b.c", "active": True})
+    return sessions
+
+
+def test_session_bound_to_ip(sessions):
+    token = sessions.create_session({"_id": "u1", "email": "a@b.c"}, "10.0.0.1")
+    assert sessions.validate_session(token, "10.0.0.1")
+    assert sessions.validate_session(token, "10.0.0.2") is None
+    sessions._forget(sessions._hash(token))
+    assert sessions.validate_session(token, "10.0.0.2") is None
+    assert sessions.validate_session(token, "10.0.0.1")
+
+
+def test_rotate_invalidates_old_token(sessions):
+    token = sessions.create_session({"_id": "u1", "email": "a@b.c"}, "10.0.0.1")
+    assert sessions.rotate_session(token, "10.0.0.2") == (None, None)
+
+    token = sessions.create_session({"_id": "u1", "email": "a@b.c"}, "10.0.0.1")
+    new_token, principal = sessions.rotate_session(token, "10.0.0.1")
+    assert new_token and new_token != token and principal["_id"] == "u1"
+    assert sessions.validate_session(token, "10.0.0.1") is None
+    assert sessions.rotate_session(token, "10.0.0.1") == (None, None)
+    assert sessions.validate_session(new_token, "10.0.0.1")["_id"] == "u1"
+
+
+def test_file_urls_follow_session(sessions):
+    token = sessions.create_session({"_id": "u1", "email": "a@b.c"}, "10.0.0.1")
+    sid = sessions.session_id(token)
+    assert sessions.session_active(sid)
+    sessions._forget(sid)
+    assert sessions.session_active(sid)  # dari DB, tanpa LRU
+
+    sessions.revoke_session(token)
+    assert not sessions.session_active(sid)
+    assert not sessions.session_active("")
@@ -0,0 +1,77 @@
+import io
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+
+def pdf(text="halo", pages=1):
+    body = b"".join(b"%d 0 obj << /Type /Page >> endobj\n" % i for i in range(pages))
+    return b"%PDF-1.4\n" + body + text.encode() + b"\n%%EOF\n"
+
+
+class Upload(io.BytesIO):
+    def __init__(self, data, name="dok.pdf"):
+        super().__init__(data)
+        self.name = name
+
+
+def upload(documents, title="Dok", category="Keuangan", year=2024, data=None, uploader=None):
+    return documents.upload_document(title, category, "", year, Upload(data or pdf(title)),
+                                     uploader or ObjectId())
+
+
+def test_upload_update_replace_delete_keep_stats_consistent(archive):
+    db, documents, stats = archive
+    stats.ensure_stats()
+
+    doc_id = upload(documents)
+    assert stats.verify() == []
+    assert stats.read_stats()["total"] == 1
+
+    assert documents.update_metadata(doc_id, {"category": "SDM", "year": 2020})
+    assert stats.verify() == []
+
+    ok, _ = documents.replace_file(doc_id, Upload(pdf("isi baru yang lebih panjang", pages=3)))
+    assert ok
+    assert stats.verify() == []
+    assert db.docs_col.find_one({"_id": ObjectId(doc_id)})["page_count"] == 3
+
+    assert documents.delete_document(doc_id)
+    assert stats.verify() == []
+    assert stats.read_stats()["total"] == 0
+
+
+def test_bulk_upload_keeps_stats_consistent(archive):
+    _, documents, stats = archive
+    stats.ensure_stats()
+    items = [{
+        "filename": f"f{i}.pdf",
+        "open": (lambda i=i: Upload(pdf(f"isi {i}"), f"f{i}.pdf")),
+        "title": f"Dok {i}",
+        "category": "Administrasi",
+        "year": 2000 + i,
+    } for i in range(5)]
+    result = documents.bulk_upload_documents(items, ObjectId(), workers=2, batch_size=2)
+    assert len(result["inserted"]) == 5 and not result["failed"]
+    assert stats.verify() == []
+    assert stats.read_stats()["total"] == 5
+
+
+def test_existing_archive_without_stats_doc(archive):
+    db, documents, stats = archive
+    db.docs_col.insert_many([{
+        "title": f"Lama {i}", "category": "Lainnya", "year": 2019,
+        "uploaded_at": datetime(2019, 5, 1), "uploader_id": ObjectId(), "size_bytes": 100,
+    } for i in range(4)])
+
+    # penulisan pertama sebelum counter ada tidak boleh membuat counter parsial
+    old_id = str(db.docs_col.find_one()["_id"])
+    assert documents.delete_document(old_id)
+    upload(documents)
+    assert stats.read_stats()["total"] == 4
+    assert stats.verify() == []
+
+    db.stats_col.delete_many({})
+    stats.ensure_stats()
+    assert stats.read_stats()["total"] == 4
+    assert stats.verify() == []
@@ -0,0 +1,18 @@
+from bson.objectid import ObjectId
+
+from test_stats import upload
+
+
+def test_migrate_to_gridfs_moves_files_and_reports_missing(archive):
+    db, documents, _ = archive
+    import storage
+
+    ids = [ObjectId(upload(documents, title=f"Dok {i}")) for i in range(10)]
+    db.docs_col.insert_one({"title": "Hilang", "file_path": "storage/tidak-ada.pdf"})
+
+    result = storage.migrate_to_gridfs(workers=2)
+    assert result["moved"] == 10 and result["missing"] == 1 and not result["failed"]
+    for d in db.docs_col.find({"_id": {"$in": ids}}):
+        assert d["file_path"].startswith(storage.GRIDFS_PREFIX)
+        with storage.open_file(d["file_path"]) as f:
+            assert f.read().startswith(b"%PDF-")
@@ -0,0 +1,25 @@
+"""Render thumbnail yang gagal ditandai dan tidak dijadwalkan ulang."""
+import pytest
+
+
+def test_failed_render_not_rescheduled(app_modules, tmp_path, monkeypatch):
+    import thumbnails
+    broken = tmp_path / "rusak.pdf"
+    broken.write_bytes(b"bukan pdf")
+    thumb_out, preview_out = thumbnails._out_paths(str(broken))
+
+    monkeypatch.setattr(thumbnails, "_render_pdf", lambda *a: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        thumbnails._render(str(broken), thumb_out, preview_out, 1024)
+    assert thumbnails.failed(str(broken))
+
+    scheduled = []
+    monkeypatch.setattr(thumbnails, "fitz", object())
+    monkeypatch.setattr(thumbnails, "schedule_thumbnails", scheduled.append)
+    assert thumbnails.get_thumbnail(str(broken)) is None
+    assert scheduled == []
+
+    monkeypatch.setattr(thumbnails, "THUMB_RETRY_SECONDS", 0)
+    assert not thumbnails.failed(str(broken))
+    thumbnails.get_thumbnail(str(broken))
+    assert scheduled == [str(broken)]
@@ -0,0 +1,168 @@
+# thumbnails.py
+"""
+Thumbnail & preview resolusi rendah halaman pertama PDF.
+
+Render dilakukan di process pool (butuh paket opsional `pymupdf`) saat
+upload/ganti file, atau saat thumbnail pertama kali diminta daftar dokumen.
+Hasil disimpan di storage/thumbs dengan batas ukuran THUMB_CACHE_MB; file
+yang paling lama tidak diakses dihapus lebih dulu. Render yang gagal (PDF
+rusak/terenkripsi) ditandai file .failed dan tidak dicoba lagi selama
+THUMB_RETRY_SECONDS.
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import get_secret
+from storage import THUMB_DIR, file_exists, open_file
+from chunked import is_chunked
+
+try:
+    import fitz  # pymupdf
+except ImportError:  # tanpa pymupdf, daftar dokumen tampil tanpa thumbnail
+    fitz = None
+
+THUMB_WIDTH = 160
+PREVIEW_WIDTH = 800
+THUMB_CACHE_MB = int(get_secret("THUMB_CACHE_MB", 200))
+THUMB_WORKERS = int(get_secret("THUMB_WORKERS", 2))
+THUMB_RETRY_SECONDS = int(get_secret("THUMB_RETRY_SECONDS", 6 * 3600))
+
+_pool = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _key(file_path):
+    return hashlib.sha1(file_path.encode()).hexdigest()
+
+
+def _out_paths(file_path):
+    key = _key(file_path)
+    return (os.path.join(THUMB_DIR, f"{key}_thumb.png"),
+            os.path.join(THUMB_DIR, f"{key}_preview.png"))
+
+
+def _failed_path(file_path):
+    return os.path.join(THUMB_DIR, f"{_key(file_path)}.failed")
+
+
+def _failed_recently(marker):
+    try:
+        return time.time() - os.path.getmtime(marker) < THUMB_RETRY_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def _evict(limit_bytes):
+    for e in os.scandir(THUMB_DIR):
+        if e.name.endswith(".failed") and not _failed_recently(e.path):
+            try:
+                os.remove(e.path)
+            except FileNotFoundError:
+                pass
+    entries = [(e.stat().st_atime, e.stat().st_size, e.path)
+               for e in os.scandir(THUMB_DIR) if e.is_file() and e.name.endswith(".png")]
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+def _render_pdf(pdf_path, thumb_out, preview_out):
+    with fitz.open(pdf_path) as pdf:
+        page = pdf[0]
+        for out, width in ((thumb_out, THUMB_WIDTH), (preview_out, PREVIEW_WIDTH)):
+            zoom = width / page.rect.width
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            tmp = out + ".tmp"
+            pix.save(tmp, output="png")
+            os.replace(tmp, out)
+
+
+def _render(file_path, thumb_out, preview_out, limit_bytes):
+    """Dijalankan di proses worker."""
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    try:
+        if not os.path.isfile(file_path) or is_chunked(file_path):
+            # pymupdf butuh file PDF biasa: salin (ber-chunk/GridFS) ke file sementara
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp, open_file(file_path) as src:
+                shutil.copyfileobj(src, tmp, 1024 * 1024)
+                tmp.flush()
+                _render_pdf(tmp.name, thumb_out, preview_out)
+        else:
+            _render_pdf(file_path, thumb_out, preview_out)
+    except Exception:
+        # tandai gagal agar daftar dokumen tidak menjadwalkan ulang di tiap rerun
+        with open(_failed_path(file_path), "w"):
+            pass
+        raise
+    _evict(limit_bytes)
+    return file_path
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: aman dipakai dari proses Streamlit yang multi-thread
+        _pool = ProcessPoolExecutor(max_workers=THUMB_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _done(file_path):
+    with _lock:
+        _pending.discard(file_path)
+
+
+def enabled():
+    return fitz is not None
+
+
+def failed(file_path):
+    """True jika render file_path baru-baru ini gagal (tidak akan dicoba dulu)."""
+    return bool(file_path) and _failed_recently(_failed_path(file_path))
+
+
+def schedule_thumbnails(file_path):
+    """Antrikan render thumbnail/preview untuk file_path (no-op tanpa pymupdf)."""
+    if fitz is None or not file_path:
+        return
+    with _lock:
+        if file_path in _pending:
+            return
+        _pending.add(file_path)
+        thumb_out, preview_out = _out_paths(file_path)
+        fut = _get_pool().submit(_render, file_path, thumb_out, preview_out,
+                                 THUMB_CACHE_MB * 1024 * 1024)
+    fut.add_done_callback(lambda _f: _done(file_path))
+
+
+def get_thumbnail(file_path, kind="thumb"):
+    """
+    Path PNG thumbnail ("thumb") atau preview ("preview") jika sudah ada di cache,
+    selain itu antrikan render dan kembalikan None.
+    """
+    if fitz is None or not file_path:
+        return None
+    thumb_out, preview_out = _out_paths(file_path)
+    path = thumb_out if kind == "thumb" else preview_out
+    if os.path.exists(path):
+        try:
+            os.utime(path)  # tandai baru diakses untuk eviction
+        except FileNotFoundError:
+            return None
+        return path
+    if not failed(file_path) and file_exists(file_path):
+        schedule_thumbnails(file_path)
+    return None
@@ -1,27 +1,97 @@
 # utils.py
 import os
-import uuid
 import base64
+import threading
+import time
 from datetime import datetime
 
 STORAGE_DIR = "storage"
 os.makedirs(STORAGE_DIR, exist_ok=True)
 
+def get_secret(key: str, default=None):
+    try:
+        import streamlit as st
+        if "secrets" in dir(st) and key in st.secrets:
+            return st.secrets[key]
+    except Exception:
+        pass
+    return os.getenv(key, default)
+
 def save_uploaded_file(uploaded_file):
     """
-    Simpan file upload ke STORAGE_DIR dengan nama unik.
+    Simpan file upload lewat backend storage aktif (lihat storage.py).
     Returns full path.
     """
-    ext = os.path.splitext(uploaded_file.name)[1]
-    unique_name = f"{uuid.uuid4().hex}{ext}"
-    path = os.path.join(STORAGE_DIR, unique_name)
-    with open(path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return path
+    from storage import save_file
+    return save_file(uploaded_file)
+
+# Tanpa file server (FILE_SERVER_URL), download & preview memuat isi file
+# utuh ke memori proses Streamlit. File di atas batas ini hanya dilayani
+# lewat file server agar memori puncak tidak bergantung pada ukuran file.
+INLINE_MAX_BYTES = int(get_secret("INLINE_MAX_BYTES", 25 * 1024 * 1024))
+
+class FileTooLarge(ValueError):
+    """File terlalu besar untuk dibaca utuh ke memori (lihat INLINE_MAX_BYTES)."""
+
+def inline_allowed(file_path, size=None):
+    if size is None:
+        from storage import file_size
+        size = file_size(file_path)
+    return size <= INLINE_MAX_BYTES
+
+def _check_inline(file_path):
+    if not inline_allowed(file_path):
+        raise FileTooLarge(f"{file_path} melebihi {INLINE_MAX_BYTES // (1024 * 1024)} MB")
+
+def read_file_bytes(file_path):
+    from storage import open_file
+    _check_inline(file_path)
+    with open_file(file_path) as f:
+        return f.read()
 
 def file_to_base64(file_path):
-    with open(file_path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
+    from storage import iter_file
+    _check_inline(file_path)
+    # encode per blok kelipatan 3 byte agar tidak ada salinan isi file mentah utuh
+    return "".join(base64.b64encode(block).decode("utf-8")
+                   for block in iter_file(file_path, chunk_size=3 * 256 * 1024))
 
 def month_label(dt):
     return dt.strftime("%Y-%m")
+
+class TTLCache:
+    """
+    Cache sederhana in-process dengan masa berlaku (detik).
+    Dipakai bersama oleh semua sesi Streamlit dalam satu proses.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def get_or_load(self, key, loader):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()